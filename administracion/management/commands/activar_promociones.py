@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from administracion import promociones
+
+
+class Command(BaseCommand):
+    help = (
+        'Desactiva las promociones vencidas y recalcula los descuentos vigentes. '
+        'Pensado para ejecutarse desde cron poco después de la medianoche.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Recalcula aunque los descuentos ya estén al día.',
+        )
+    
+    def handle(self, *args, **options):
+        resumen = promociones.materializar(forzar=options['forzar'])
+        if resumen is None:
+            self.stdout.write('Los descuentos ya estaban al día.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Descuentos recalculados: {resumen['bicicletas']} bicicletas con promoción propia, "
+            f"{resumen['general']}% para todo el catálogo, "
+            f"{resumen['vencidas']} promociones vencidas desactivadas."
+        ))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0002_initial'),
+        ('productos', '0006_indice_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalculoDescuentos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(blank=True, null=True, verbose_name='Calculado Para')),
+                ('desactualizado', models.BooleanField(default=True, verbose_name='Desactualizado')),
+                ('descuento_general', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Descuento para Todo el Catálogo')),
+                ('fecha_ejecucion', models.DateTimeField(auto_now=True, verbose_name='Última Ejecución')),
+            ],
+            options={
+                'verbose_name': 'Cálculo de Descuentos',
+                'verbose_name_plural': 'Cálculo de Descuentos',
+            },
+        ),
+        migrations.CreateModel(
+            name='DescuentoVigente',
+            fields=[
+                ('bicicleta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='descuento_vigente', serialize=False, to='productos.bicicleta', verbose_name='Bicicleta')),
+                ('descuento', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Porcentaje de Descuento')),
+            ],
+            options={
+                'verbose_name': 'Descuento Vigente',
+                'verbose_name_plural': 'Descuentos Vigentes',
+            },
+        ),
+    ]
@@ -139,5 +139,67 @@ class Promocion(models.Model):
     def esta_vigente(self):
         """Indica si la promoción está vigente actualmente."""
         from django.utils import timezone
-        hoy = timezone.now().date()
+        hoy = timezone.localdate()
         return self.activa and self.fecha_inicio <= hoy <= self.fecha_fin
+
+
+class DescuentoVigente(models.Model):
+    """
+    Mejor descuento vigente de cada bicicleta con promociones propias.
+    Tabla materializada por administracion.promociones; no se edita a mano.
+    """
+
+    bicicleta = models.OneToOneField(
+        Bicicleta,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='descuento_vigente',
+        verbose_name='Bicicleta'
+    )
+    descuento = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        verbose_name='Porcentaje de Descuento'
+    )
+
+    class Meta:
+        verbose_name = 'Descuento Vigente'
+        verbose_name_plural = 'Descuentos Vigentes'
+
+    def __str__(self):
+        return f"{self.bicicleta_id}: {self.descuento}%"
+
+
+class CalculoDescuentos(models.Model):
+    """
+    Estado de la tabla de descuentos vigentes (una sola fila).
+    Guarda el día para el que se calculó y el descuento que aplica a todo
+    el catálogo, que no se repite por bicicleta.
+    """
+
+    fecha = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Calculado Para'
+    )
+    desactualizado = models.BooleanField(
+        default=True,
+        verbose_name='Desactualizado'
+    )
+    descuento_general = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        verbose_name='Descuento para Todo el Catálogo'
+    )
+    fecha_ejecucion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Ejecución'
+    )
+
+    class Meta:
+        verbose_name = 'Cálculo de Descuentos'
+        verbose_name_plural = 'Cálculo de Descuentos'
+
+    def __str__(self):
+        return f"Descuentos calculados para {self.fecha}"
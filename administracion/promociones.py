@@ -0,0 +1,123 @@
+"""
+Descuentos vigentes materializados.
+
+Las promociones se definen por rangos de fechas, pero al mostrar precios solo
+interesa el mejor descuento de hoy para cada bicicleta. `materializar()` lo
+calcula una vez y lo guarda en DescuentoVigente (bicicleta -> descuento), de
+modo que resolver un precio es un join por clave primaria en lugar de revisar
+los rangos de todas las promociones.
+
+Solo se recalcula cuando cambia el día o cuando se modifica una promoción.
+El comando `activar_promociones` lo ejecuta desde cron justo después de la
+medianoche; si aún no se ha ejecutado, el primer precio que se consulte en el
+día lo recalcula. Si esa consulta ocurre dentro de una transacción (por
+ejemplo, la del checkout, que bloquea las bicicletas), el recálculo espera a
+que se confirme y mientras tanto se usa la última tabla calculada.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from productos import cache as cache_catalogo
+from .models import CalculoDescuentos, DescuentoVigente, Promocion
+
+
+PK_ESTADO = 1
+
+CLAVE_FECHA = 'administracion:descuentos:fecha'
+
+# Cada cuánto se vuelve a confirmar el estado en la base de datos, por si
+# otro proceso marcó los descuentos como desactualizados.
+TIMEOUT_VERIFICACION = 300
+
+CERO = Decimal('0')
+
+
+def promociones_vigentes(hoy=None):
+    """Promociones activas cuya vigencia incluye `hoy`."""
+    hoy = hoy or timezone.localdate()
+    return Promocion.objects.filter(activa=True, fecha_inicio__lte=hoy, fecha_fin__gte=hoy)
+
+
+def esta_actualizado(hoy=None):
+    """Indica si la tabla de descuentos corresponde a `hoy` y a las promociones actuales."""
+    hoy = hoy or timezone.localdate()
+    if cache.get(CLAVE_FECHA) == hoy:
+        return True
+    actualizado = CalculoDescuentos.objects.filter(
+        pk=PK_ESTADO, fecha=hoy, desactualizado=False
+    ).exists()
+    if actualizado:
+        cache.set(CLAVE_FECHA, hoy, TIMEOUT_VERIFICACION)
+    return actualizado
+
+
+def asegurar_actualizado():
+    """
+    Recalcula los descuentos si cambió el día o alguna promoción: de
+    inmediato fuera de una transacción, o al confirmarla si hay una en curso.
+    """
+    if not esta_actualizado():
+        transaction.on_commit(materializar)
+
+
+def materializar(hoy=None, forzar=False):
+    """
+    Desactiva las promociones vencidas y recalcula el mejor descuento de cada
+    bicicleta. Retorna un resumen, o None si ya estaba al día y no se forzó.
+    """
+    hoy = hoy or timezone.localdate()
+    with transaction.atomic():
+        estado, _ = CalculoDescuentos.objects.select_for_update().get_or_create(pk=PK_ESTADO)
+        if not forzar and estado.fecha == hoy and not estado.desactualizado:
+            cache.set(CLAVE_FECHA, hoy, TIMEOUT_VERIFICACION)
+            return None
+
+        vencidas = Promocion.objects.filter(activa=True, fecha_fin__lt=hoy).update(activa=False)
+
+        vigentes = promociones_vigentes(hoy)
+        general = vigentes.filter(aplica_a_todas=True).aggregate(
+            maximo=Max('descuento')
+        )['maximo'] or CERO
+
+        # Solo se guardan las bicicletas cuyo descuento propio supera al general
+        por_bicicleta = (
+            Promocion.bicicletas.through.objects
+            .filter(promocion__in=vigentes)
+            .values('bicicleta_id')
+            .annotate(maximo=Max('promocion__descuento'))
+            .filter(maximo__gt=general)
+        )
+        DescuentoVigente.objects.all().delete()
+        creados = DescuentoVigente.objects.bulk_create(
+            [
+                DescuentoVigente(bicicleta_id=fila['bicicleta_id'], descuento=fila['maximo'])
+                for fila in por_bicicleta
+            ],
+            batch_size=500,
+        )
+
+        estado.fecha = hoy
+        estado.desactualizado = False
+        estado.descuento_general = general
+        estado.save()
+
+    cache.set(CLAVE_FECHA, hoy, TIMEOUT_VERIFICACION)
+    transaction.on_commit(cache_catalogo.incrementar_version)
+    return {'bicicletas': len(creados), 'general': general, 'vencidas': vencidas}
+
+
+def recalculado_desde(desde):
+    """Indica si los descuentos se recalcularon después de `desde`."""
+    asegurar_actualizado()
+    return CalculoDescuentos.objects.filter(pk=PK_ESTADO, fecha_ejecucion__gt=desde).exists()
+
+
+def marcar_desactualizado():
+    """Invalida los descuentos y los recalcula al confirmar la transacción."""
+    CalculoDescuentos.objects.filter(pk=PK_ESTADO).update(desactualizado=True)
+    cache.delete(CLAVE_FECHA)
+    transaction.on_commit(materializar)
@@ -0,0 +1,22 @@
+"""
+Señales de administración: los cambios en promociones recalculan los
+descuentos vigentes, lo que a su vez invalida los fragmentos cacheados del
+catálogo.
+"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import promociones
+from .models import Promocion
+
+
+@receiver(post_save, sender=Promocion)
+@receiver(post_delete, sender=Promocion)
+def promocion_modificada(sender, instance, **kwargs):
+    promociones.marcar_desactualizado()
+
+
+@receiver(m2m_changed, sender=Promocion.bicicletas.through)
+def bicicletas_promocion_modificadas(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        promociones.marcar_desactualizado()
@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.db.models import Sum, F, Count
 from .models import PQRS, Promocion
 from productos.models import Bicicleta
-from pedidos.models import Pedido
+from pedidos import metricas
 
 
 def admin_required(view_func):
@@ -22,16 +22,9 @@ def admin_required(view_func):
 @admin_required
 def dashboard(request):
     """Dashboard del administrador con métricas."""
-    # Métricas de ventas
-    total_pedidos = Pedido.objects.count()
-    pedidos_entregados = Pedido.objects.filter(estado=Pedido.Estado.ENTREGADO).count()
-    
-    # Margen de ganancia promedio
-    bicicletas = Bicicleta.objects.filter(activo=True)
-    if bicicletas.exists():
-        total_margen = sum(b.margen_ganancia for b in bicicletas) / bicicletas.count()
-    else:
-        total_margen = 0
+    # Métricas de ventas e inventario (una consulta cada una)
+    ventas = metricas.metricas_admin()
+    inventario = metricas.metricas_inventario()
     
     # PQRS pendientes
     pqrs_abiertos = PQRS.objects.filter(estado=PQRS.Estado.ABIERTO).count()
@@ -39,16 +32,13 @@ def dashboard(request):
     # Promociones activas
     promociones_activas = Promocion.objects.filter(activa=True).count()
     
-    # Productos con bajo stock
-    bajo_stock = Bicicleta.objects.filter(stock__lt=3, activo=True).count()
-    
     context = {
-        'total_pedidos': total_pedidos,
-        'pedidos_entregados': pedidos_entregados,
-        'margen_promedio': total_margen,
+        'total_pedidos': ventas['total_pedidos'],
+        'pedidos_entregados': ventas['entregados'],
+        'margen_promedio': inventario['margen_promedio'],
         'pqrs_abiertos': pqrs_abiertos,
         'promociones_activas': promociones_activas,
-        'bajo_stock': bajo_stock,
+        'bajo_stock': inventario['bajo_stock'],
     }
     return render(request, 'administracion/dashboard.html', context)
 
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'pedidos.middleware.CarritoCookieMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -88,6 +89,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Memoria local por defecto. Con varios procesos usar FileBasedCache para que
+# todos compartan la versión del catálogo.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'aura-bikers',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Segundos que se conserva un fragmento renderizado del catálogo
+CATALOGO_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Dónde se guarda el carrito: en una cookie firmada (sin escrituras en la base
+# de datos) o en la sesión ('pedidos.carrito.almacenamiento.AlmacenamientoSesion')
+CARRITO_ALMACENAMIENTO = 'pedidos.carrito.almacenamiento.AlmacenamientoCookie'
+
+# Minutos que una bicicleta agregada al carrito queda reservada para ese cliente
+RESERVA_STOCK_MINUTOS = 15
+
+# Horas que se conserva la respuesta de un POST con clave de idempotencia
+IDEMPOTENCIA_HORAS = 24
+
+# Segundos tras los cuales una petición idempotente que no terminó se da por abandonada
+IDEMPOTENCIA_EN_CURSO_SEGUNDOS = 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,116 @@
+"""
+Despacho de varios pedidos a la vez.
+
+Toda la selección se despacha en una transacción: la demanda de cada
+pedido por bicicleta se lee con una consulta agrupada, se compara contra el
+stock bloqueado y los pedidos que alcanzan pasan a DESPACHADO con la
+máquina de estados (un UPDATE de pedidos, un UPDATE de stock por bicicleta
+y el historial en bloque). Los que no alcanzan o ya no están confirmados
+se reportan uno por uno sin frenar a los demás. Si el stock cambia entre
+la verificación y el descuento, se saca el pedido que ya no alcanza y se
+reintenta con el resto.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from pedidos import estados
+from pedidos.models import DetallePedido, Pedido
+from pedidos.servicios import StockInsuficiente
+from productos.models import Bicicleta
+from .models import ConfirmacionDespacho
+
+
+# Límite de pedidos por envío del formulario
+MAXIMO_PEDIDOS_LOTE = 200
+
+
+class ResultadoDespacho:
+    """Pedidos despachados y {pk: motivo} de los que no se pudieron despachar."""
+
+    def __init__(self, despachados, rechazados):
+        self.despachados = despachados
+        self.rechazados = rechazados
+
+
+def _demanda_por_pedido(pedido_ids):
+    """{pedido_id: {bicicleta_id: unidades}} en una consulta agrupada."""
+    demanda = defaultdict(dict)
+    filas = (
+        DetallePedido.objects.filter(pedido_id__in=pedido_ids)
+        .order_by()
+        .values_list('pedido_id', 'bicicleta_id')
+        .annotate(total=Sum('cantidad'))
+    )
+    for pedido_id, bicicleta_id, total in filas:
+        demanda[pedido_id][bicicleta_id] = total
+    return demanda
+
+
+def despachar_varios(pedido_ids, usuario, notas=''):
+    """
+    Despacha los pedidos CONFIRMADOS de `pedido_ids`. Se atienden del más
+    antiguo al más reciente, así que cuando el stock no alcanza para todos
+    quedan fuera los últimos en llegar.
+    """
+    pedido_ids = set(pedido_ids)
+    rechazados = {}
+    with transaction.atomic():
+        confirmados = list(
+            Pedido.objects.select_for_update()
+            .filter(pk__in=pedido_ids, estado=Pedido.Estado.CONFIRMADO)
+            .order_by('fecha_creacion', 'pk')
+        )
+        for pk in pedido_ids - {pedido.pk for pedido in confirmados}:
+            rechazados[pk] = f'El pedido #{pk} ya no está confirmado.'
+
+        demanda = _demanda_por_pedido([pedido.pk for pedido in confirmados])
+        bicicletas = (
+            Bicicleta.objects.select_for_update()
+            .filter(pk__in={bicicleta_id for lineas in demanda.values() for bicicleta_id in lineas})
+            .in_bulk()
+        )
+        restante = {pk: bicicleta.stock for pk, bicicleta in bicicletas.items()}
+
+        aceptados = []
+        for pedido in confirmados:
+            lineas = demanda.get(pedido.pk, {})
+            faltante = next(
+                (bicicleta_id for bicicleta_id, cantidad in lineas.items()
+                 if cantidad > restante[bicicleta_id]),
+                None,
+            )
+            if faltante is not None:
+                error = StockInsuficiente(bicicletas[faltante], restante[faltante], lineas[faltante])
+                rechazados[pedido.pk] = f'Pedido #{pedido.pk}: {error}'
+                continue
+            for bicicleta_id, cantidad in lineas.items():
+                restante[bicicleta_id] -= cantidad
+            aceptados.append(pedido)
+
+        # El descuento de stock (un UPDATE por bicicleta) es efecto de la transición
+        while True:
+            try:
+                resultado = estados.transicionar_varios(aceptados, Pedido.Estado.DESPACHADO, usuario, notas)
+                break
+            except StockInsuficiente as error:
+                # El stock cambió después de leerlo (la transición ya se revirtió):
+                # se saca el último pedido que pide esa bicicleta y se reintenta
+                pedido = next(
+                    (pedido for pedido in reversed(aceptados) if error.bicicleta.pk in demanda[pedido.pk]),
+                    None,
+                )
+                if pedido is None:
+                    raise
+                aceptados.remove(pedido)
+                rechazados[pedido.pk] = f'Pedido #{pedido.pk}: {error}'
+        rechazados.update(resultado.rechazados)
+        ConfirmacionDespacho.objects.bulk_create(
+            [
+                ConfirmacionDespacho(pedido=pedido, confirmado_por=usuario, notas=notas)
+                for pedido in resultado.aplicados
+            ],
+            batch_size=500,
+        )
+    return ResultadoDespacho(resultado.aplicados, rechazados)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodega', '0002_initial'),
+        ('productos', '0005_indices_catalogo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productodanado',
+            index=models.Index(condition=models.Q(('resuelto', False)), fields=['-fecha'], name='dano_pendiente_idx'),
+        ),
+    ]
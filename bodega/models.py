@@ -45,7 +45,8 @@ class IngresoStock(models.Model):
         # Al guardar, actualizar el stock de la bicicleta
         if not self.pk:  # Solo en creación
             self.bicicleta.stock += self.cantidad
-            self.bicicleta.save(update_fields=['stock'])
+            # fecha_actualizacion (auto_now) para que el feed incremental reporte el ingreso
+            self.bicicleta.save(update_fields=['stock', 'fecha_actualizacion'])
         super().save(*args, **kwargs)
 
 
@@ -108,6 +109,13 @@ class ProductoDanado(models.Model):
         verbose_name = 'Producto Dañado'
         verbose_name_plural = 'Productos Dañados'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(
+                fields=['-fecha'],
+                condition=models.Q(resuelto=False),
+                name='dano_pendiente_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.bicicleta.modelo} - {self.get_motivo_tipo_display()} - {self.fecha.strftime('%Y-%m-%d')}"
@@ -117,7 +125,8 @@ class ProductoDanado(models.Model):
         if not self.pk:  # Solo en creación
             if self.bicicleta.stock >= self.cantidad_afectada:
                 self.bicicleta.stock -= self.cantidad_afectada
-                self.bicicleta.save(update_fields=['stock'])
+                # fecha_actualizacion (auto_now) para que el feed incremental reporte el ingreso
+            self.bicicleta.save(update_fields=['stock', 'fecha_actualizacion'])
         super().save(*args, **kwargs)
 
 
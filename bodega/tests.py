@@ -1,3 +1,89 @@
+import re
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from pedidos import servicios
+from pedidos.models import DetallePedido, HistorialEstadoPedido, Pedido
+from productos.models import Bicicleta
+from . import despachos
+from .models import ConfirmacionDespacho, ProductoDanado
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes de consulta se verifican con SQLite')
+class IndicesBodegaTests(TestCase):
+
+    def test_danos_pendientes_usan_indice_parcial(self):
+        plan = ProductoDanado.objects.filter(resuelto=False).explain()
+        self.assertIn('USING INDEX dano_pendiente_idx', plan)
+        self.assertIsNone(re.search(r'SCAN bodega_productodanado\s*$', plan, re.MULTILINE))
+
+
+class DespachoMasivoTests(TestCase):
+    """El despacho en lote descuenta el stock por bicicleta y reporta los pedidos que no alcanzan."""
+
+    def setUp(self):
+        Usuario = get_user_model()
+        self.bodeguero = Usuario.objects.create_user('bodega', password='x', rol='bodeguero')
+        cliente = Usuario.objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.bicicleta = Bicicleta.objects.create(
+            marca='Trek', modelo='Marlin', gama='media', tipo='mtb', medida_marco='m',
+            precio=1000, costo=600, stock=5,
+        )
+        self.pedidos = []
+        for _ in range(4):
+            pedido = Pedido.objects.create(
+                cliente=cliente, direccion_envio='Calle 1', estado=Pedido.Estado.CONFIRMADO, total=2000,
+            )
+            DetallePedido.objects.create(
+                pedido=pedido, bicicleta=self.bicicleta, cantidad=2, precio_unitario=1000,
+            )
+            self.pedidos.append(pedido)
+        self.pedidos[3].estado = Pedido.Estado.PENDIENTE
+        self.pedidos[3].save()
+
+    def test_despacha_los_que_alcanzan_y_reporta_el_resto(self):
+        resultado = despachos.despachar_varios(
+            [pedido.pk for pedido in self.pedidos], self.bodeguero, 'Lote de la mañana',
+        )
+
+        self.assertEqual(
+            sorted(pedido.pk for pedido in resultado.despachados),
+            [self.pedidos[0].pk, self.pedidos[1].pk],
+        )
+        self.assertEqual(sorted(resultado.rechazados), [self.pedidos[2].pk, self.pedidos[3].pk])
+        self.assertIn('No hay suficiente stock', resultado.rechazados[self.pedidos[2].pk])
+
+        self.bicicleta.refresh_from_db()
+        self.assertEqual(self.bicicleta.stock, 1)
+        self.assertEqual(ConfirmacionDespacho.objects.count(), 2)
+        self.assertEqual(
+            HistorialEstadoPedido.objects.filter(estado_nuevo=Pedido.Estado.DESPACHADO).count(), 2
+        )
+        self.assertEqual(
+            Pedido.objects.filter(estado=Pedido.Estado.DESPACHADO).count(), 2
+        )
+
+    def test_stock_que_cambia_antes_del_descuento_saca_solo_el_ultimo_pedido(self):
+        descontar = servicios.descontar_stock_varios
+        llamadas = []
+
+        def otro_despacho_se_adelanta(pedidos):
+            llamadas.append(len(pedidos))
+            if len(llamadas) == 1:
+                raise servicios.StockInsuficiente(self.bicicleta, 3, 4)
+            return descontar(pedidos)
+
+        with mock.patch.object(servicios, 'descontar_stock_varios', otro_despacho_se_adelanta):
+            resultado = despachos.despachar_varios(
+                [pedido.pk for pedido in self.pedidos[:2]], self.bodeguero,
+            )
+
+        self.assertEqual(llamadas, [2, 1])
+        self.assertEqual([pedido.pk for pedido in resultado.despachados], [self.pedidos[0].pk])
+        self.assertIn('No hay suficiente stock', resultado.rechazados[self.pedidos[1].pk])
+        self.bicicleta.refresh_from_db()
+        self.assertEqual(self.bicicleta.stock, 3)
+        self.assertEqual(ConfirmacionDespacho.objects.count(), 1)
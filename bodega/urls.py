@@ -9,4 +9,5 @@ urlpatterns = [
     path('productos-danados/', views.productos_danados, name='productos_danados'),
     path('registrar-dano/', views.registrar_dano, name='registrar_dano'),
     path('confirmar-despacho/<int:pedido_id>/', views.confirmar_despacho, name='confirmar_despacho'),
+    path('despacho-masivo/', views.despacho_masivo, name='despacho_masivo'),
 ]
@@ -1,10 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum, Count
 from .models import IngresoStock, ProductoDanado, ConfirmacionDespacho
+from . import despachos
+from pedidos import consultas, metricas as metricas_pedidos
+from pedidos.estados import TransicionInvalida
+from pedidos.idempotencia import idempotente
 from pedidos.models import Pedido
+from pedidos.servicios import StockInsuficiente
 from productos.models import Bicicleta
 
 
@@ -23,23 +28,18 @@ def bodeguero_required(view_func):
 @bodeguero_required
 def panel_bodega(request):
     """Panel principal del bodeguero con métricas operativas."""
-    hoy = timezone.now().date()
-    
     # Solo pedidos CONFIRMADOS (listos para despachar)
-    pedidos_para_despacho = Pedido.objects.filter(estado=Pedido.Estado.CONFIRMADO)
-    ingresos_recientes = IngresoStock.objects.all()[:10]
+    pedidos_para_despacho, anterior, siguiente = consultas.paginar_pedidos(
+        request, Pedido.objects.filter(estado=Pedido.Estado.CONFIRMADO)
+    )
+    ingresos_recientes = IngresoStock.objects.select_related('bicicleta', 'confirmado_por')[:10]
     danos_pendientes = ProductoDanado.objects.filter(resuelto=False)
     
     # Métricas operativas
     metricas = {
-        'para_despachar': pedidos_para_despacho.count(),
-        'despachados_hoy': Pedido.objects.filter(
-            estado=Pedido.Estado.DESPACHADO
-        ).count(),
-        'bajo_stock': Bicicleta.objects.filter(stock__lt=3, activo=True).count(),
-        'sin_stock': Bicicleta.objects.filter(stock=0, activo=True).count(),
+        **metricas_pedidos.metricas_bodega(),
+        **metricas_pedidos.metricas_inventario(),
         'danos_pendientes': danos_pendientes.count(),
-        'total_productos': Bicicleta.objects.filter(activo=True).count(),
     }
     
     # Productos con bajo stock
@@ -47,6 +47,8 @@ def panel_bodega(request):
     
     context = {
         'pedidos_para_despacho': pedidos_para_despacho,
+        'pagina_anterior': anterior,
+        'pagina_siguiente': siguiente,
         'ingresos_recientes': ingresos_recientes,
         'danos_pendientes': danos_pendientes,
         'metricas': metricas,
@@ -122,16 +124,55 @@ def confirmar_despacho(request, pedido_id):
     if request.method == 'POST':
         notas = request.POST.get('notas', '')
         
-        # Crear confirmación de despacho
-        ConfirmacionDespacho.objects.create(
-            pedido=pedido,
-            confirmado_por=request.user,
-            notas=notas
-        )
-        
-        # Cambiar estado del pedido
-        pedido.cambiar_estado(Pedido.Estado.DESPACHADO, request.user)
+        # Confirmación y cambio de estado (que descuenta el stock) juntos
+        try:
+            with transaction.atomic():
+                pedido.cambiar_estado(Pedido.Estado.DESPACHADO, request.user)
+                ConfirmacionDespacho.objects.create(
+                    pedido=pedido,
+                    confirmado_por=request.user,
+                    notas=notas
+                )
+        except (TransicionInvalida, StockInsuficiente) as error:
+            messages.error(request, str(error))
+            return redirect('bodega:panel')
         messages.success(request, f'Pedido #{pedido.pk} despachado exitosamente.')
         return redirect('bodega:panel')
     
     return render(request, 'bodega/confirmar_despacho.html', {'pedido': pedido})
+
+
+@bodeguero_required
+@idempotente
+def despacho_masivo(request):
+    """Despachar varios pedidos confirmados en una sola operación."""
+    if request.method == 'POST':
+        seleccion = [int(pk) for pk in request.POST.getlist('pedidos') if pk.isdigit()]
+        if not seleccion:
+            messages.error(request, 'Selecciona al menos un pedido.')
+            return redirect('bodega:despacho_masivo')
+        if len(seleccion) > despachos.MAXIMO_PEDIDOS_LOTE:
+            messages.error(request, f'Máximo {despachos.MAXIMO_PEDIDOS_LOTE} pedidos por despacho.')
+            return redirect('bodega:despacho_masivo')
+        
+        try:
+            resultado = despachos.despachar_varios(seleccion, request.user, request.POST.get('notas', ''))
+        except StockInsuficiente as error:
+            messages.error(request, f'No se despachó ningún pedido. {error}')
+            return redirect('bodega:despacho_masivo')
+        if resultado.despachados:
+            messages.success(request, f'{len(resultado.despachados)} pedido(s) despachado(s). Stock descontado.')
+        for motivo in resultado.rechazados.values():
+            messages.error(request, motivo)
+        return redirect('bodega:despacho_masivo')
+    
+    pedidos, anterior, siguiente = consultas.paginar_pedidos(
+        request,
+        Pedido.objects.filter(estado=Pedido.Estado.CONFIRMADO).prefetch_related('detalles__bicicleta'),
+        tamano=despachos.MAXIMO_PEDIDOS_LOTE,
+    )
+    return render(request, 'bodega/despacho_masivo.html', {
+        'pedidos': pedidos,
+        'pagina_anterior': anterior,
+        'pagina_siguiente': siguiente,
+    })
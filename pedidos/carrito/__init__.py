@@ -0,0 +1,234 @@
+"""
+Clase Carrito para manejar el carrito de compras.
+
+Dónde se guarda el carrito lo decide el backend configurado en
+CARRITO_ALMACENAMIENTO (ver pedidos.carrito.almacenamiento).
+"""
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.db import transaction
+
+from productos.models import Bicicleta
+from productos.precios import con_precio_efectivo, precio_efectivo
+from .. import reservas
+from .almacenamiento import obtener_almacenamiento
+
+
+class ResumenCarrito:
+    """
+    Foto inmutable del carrito: las bicicletas se cargan en una sola
+    consulta y los totales se calculan una vez.
+    """
+    
+    def __init__(self, items):
+        self.items = tuple(MappingProxyType(item) for item in items)
+        self.total = sum((item['subtotal'] for item in self.items), Decimal('0'))
+        self.cantidad = sum(item['cantidad'] for item in self.items)
+    
+    def __iter__(self):
+        return iter(self.items)
+    
+    def __len__(self):
+        return len(self.items)
+
+
+def _mensaje_sin_stock(disponible):
+    if disponible <= 0:
+        return "Las unidades disponibles están reservadas en otros carritos."
+    return f"Solo hay {disponible} unidades disponibles."
+
+
+def obtener_carrito(request):
+    """
+    Carrito de la petición actual. Se crea una sola vez por petición para
+    que vistas y templates compartan el mismo resumen.
+    """
+    if not hasattr(request, '_carrito'):
+        request._carrito = Carrito(request)
+    return request._carrito
+
+
+class Carrito:
+    """
+    Carrito de compras del usuario.
+    """
+    
+    def __init__(self, request):
+        """
+        Inicializa el carrito desde el almacenamiento. Solo lee: un carrito
+        vacío no se guarda hasta que se le agrega algo.
+        """
+        self.usuario = request.user
+        self.almacenamiento = obtener_almacenamiento(request)
+        self.carrito = self.almacenamiento.cargar()
+        self._cantidad = None
+        self._resumen = None
+    
+    def agregar(self, bicicleta, cantidad=1):
+        """
+        Agrega una bicicleta al carrito o actualiza su cantidad.
+        Retorna (exito, mensaje).
+        """
+        [(_bicicleta_id, exito, mensaje)] = self._aplicar({bicicleta.id: bicicleta}, [(bicicleta.id, cantidad)])
+        return exito, mensaje
+    
+    def agregar_varios(self, lineas):
+        """
+        Agrega varias bicicletas con una sola consulta y una sola escritura
+        del carrito. `lineas` es una lista de (bicicleta_id, cantidad).
+        Retorna una lista de (bicicleta_id, exito, mensaje) en el mismo orden.
+        """
+        bicicletas = con_precio_efectivo(
+            Bicicleta.objects.filter(id__in={bicicleta_id for bicicleta_id, _cantidad in lineas})
+        ).in_bulk()
+        return self._aplicar(bicicletas, lineas)
+    
+    def _aplicar(self, bicicletas, lineas):
+        """
+        Valida las líneas contra el stock disponible (descontando lo reservado
+        en otros carritos), las aplica y reserva las unidades aceptadas.
+        """
+        resultados = []
+        reservadas = {}
+        with transaction.atomic():
+            disponibles = reservas.disponibles(bicicletas.keys(), self.usuario, bloquear=True)
+            for bicicleta_id, cantidad in lineas:
+                bicicleta = bicicletas.get(bicicleta_id)
+                if bicicleta is None:
+                    resultados.append((bicicleta_id, False, "Producto no encontrado."))
+                    continue
+                exito, mensaje = self._agregar(bicicleta, cantidad, disponibles.get(bicicleta_id, 0))
+                if exito:
+                    reservadas[bicicleta_id] = self.carrito[str(bicicleta_id)]['cantidad']
+                resultados.append((bicicleta_id, exito, mensaje))
+            reservas.reservar(self.usuario, reservadas)
+        
+        if reservadas:
+            self.guardar()
+        return resultados
+    
+    def _agregar(self, bicicleta, cantidad, disponible):
+        """Valida y aplica una línea sin guardar el carrito."""
+        bicicleta_id = str(bicicleta.id)
+        
+        if cantidad < 1:
+            return False, "Cantidad inválida."
+        
+        # Validar disponibilidad
+        if not bicicleta.disponible:
+            return False, "Este producto está agotado."
+        
+        # Calcular cantidad total (actual + nueva)
+        cantidad_actual = self.carrito.get(bicicleta_id, {}).get('cantidad', 0)
+        cantidad_total = cantidad_actual + cantidad
+        
+        # Validar stock suficiente (sin lo reservado por otros clientes)
+        if cantidad_total > disponible:
+            return False, _mensaje_sin_stock(disponible)
+        
+        if bicicleta_id not in self.carrito:
+            maximo = self.almacenamiento.maximo_lineas
+            if maximo is not None and len(self.carrito) >= maximo:
+                return False, f"El carrito admite hasta {maximo} productos distintos."
+            self.carrito[bicicleta_id] = {
+                'cantidad': 0,
+                'precio': str(precio_efectivo(bicicleta))
+            }
+        
+        self.carrito[bicicleta_id]['cantidad'] = cantidad_total
+        return True, "Producto agregado al carrito."
+    
+    def eliminar(self, bicicleta_id):
+        """Elimina una bicicleta del carrito y libera su reserva."""
+        bicicleta_id = str(bicicleta_id)
+        if bicicleta_id in self.carrito:
+            del self.carrito[bicicleta_id]
+            reservas.liberar(self.usuario, [int(bicicleta_id)])
+            self.guardar()
+    
+    def actualizar_cantidad(self, bicicleta_id, cantidad):
+        """
+        Actualiza la cantidad de una bicicleta.
+        Retorna (exito, mensaje).
+        """
+        bicicleta_id = str(bicicleta_id)
+        
+        if bicicleta_id not in self.carrito:
+            return False, "Producto no encontrado en el carrito."
+        
+        if cantidad <= 0:
+            self.eliminar(bicicleta_id)
+            return True, "Producto eliminado del carrito."
+        
+        # Validar stock y renovar la reserva
+        with transaction.atomic():
+            disponible = reservas.disponibles([int(bicicleta_id)], self.usuario, bloquear=True).get(int(bicicleta_id))
+            if disponible is None:
+                self.eliminar(bicicleta_id)
+                return False, "Producto no encontrado."
+            if cantidad > disponible:
+                return False, _mensaje_sin_stock(disponible)
+            reservas.reservar(self.usuario, {int(bicicleta_id): cantidad})
+        
+        self.carrito[bicicleta_id]['cantidad'] = cantidad
+        self.guardar()
+        return True, "Cantidad actualizada."
+    
+    def limpiar(self):
+        """Vacía el carrito y libera sus reservas."""
+        self.carrito = {}
+        reservas.liberar(self.usuario)
+        self.guardar()
+    
+    def guardar(self):
+        """Escribe el carrito en el almacenamiento configurado."""
+        self.almacenamiento.guardar(self.carrito)
+        self._cantidad = None
+        self._resumen = None
+    
+    @property
+    def cantidad(self):
+        """Número total de unidades en el carrito (se calcula una sola vez)."""
+        if self._cantidad is None:
+            self._cantidad = sum(item['cantidad'] for item in self.carrito.values())
+        return self._cantidad
+    
+    def resumen(self):
+        """
+        Retorna el ResumenCarrito con los datos completos de cada bicicleta.
+        El precio es el efectivo actual (con promociones vigentes), no el
+        que tenía la bicicleta cuando se agregó. Se construye una sola vez
+        hasta que el carrito cambie.
+        """
+        if self._resumen is None:
+            bicicletas = con_precio_efectivo(Bicicleta.objects.filter(id__in=self.carrito.keys()))
+            items = []
+            for bicicleta in bicicletas:
+                item = self.carrito[str(bicicleta.id)]
+                precio = precio_efectivo(bicicleta)
+                items.append({
+                    'bicicleta': bicicleta,
+                    'cantidad': item['cantidad'],
+                    'precio': precio,
+                    'precio_lista': bicicleta.precio,
+                    'subtotal': precio * item['cantidad']
+                })
+            self._resumen = ResumenCarrito(items)
+        return self._resumen
+    
+    def get_items(self):
+        """Retorna los items del carrito con datos completos de bicicleta."""
+        return self.resumen().items
+    
+    def get_total(self):
+        """Calcula el total del carrito con los precios efectivos."""
+        return self.resumen().total
+    
+    def __len__(self):
+        """Retorna el número total de items en el carrito."""
+        return self.cantidad
+    
+    def __iter__(self):
+        """Itera sobre los items del carrito."""
+        return iter(self.get_items())
@@ -0,0 +1,94 @@
+"""
+Backends de almacenamiento del carrito.
+
+Un backend sabe cargar y guardar el diccionario del carrito
+{bicicleta_id: {'cantidad': n, ...}} de una petición. Se elige con el
+setting CARRITO_ALMACENAMIENTO:
+
+- AlmacenamientoSesion: dentro de la sesión de Django (una escritura de la
+  fila de sesión por cada cambio).
+- AlmacenamientoCookie: en una cookie firmada y comprimida, así que
+  modificar el carrito no toca la base de datos. Solo guarda las cantidades;
+  los precios siempre se recalculan al mostrar el carrito.
+"""
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+
+ALMACENAMIENTO_POR_DEFECTO = 'pedidos.carrito.almacenamiento.AlmacenamientoSesion'
+
+
+class AlmacenamientoSesion:
+    """Guarda el carrito en la sesión del usuario."""
+
+    CLAVE = 'carrito'
+    maximo_lineas = None
+
+    def __init__(self, request):
+        self.session = request.session
+
+    def cargar(self):
+        return self.session.get(self.CLAVE) or {}
+
+    def guardar(self, carrito):
+        # Un carrito vacío se quita de la sesión en lugar de guardar {}
+        if carrito:
+            self.session[self.CLAVE] = carrito
+            self.session.modified = True
+        elif self.CLAVE in self.session:
+            del self.session[self.CLAVE]
+
+
+class AlmacenamientoCookie:
+    """
+    Guarda el carrito en una cookie firmada y comprimida. La cookie queda
+    ligada al usuario que la creó, para que otra persona que inicie sesión en
+    el mismo navegador no herede el carrito. CarritoCookieMiddleware escribe
+    la cookie en la respuesta.
+    """
+
+    NOMBRE_COOKIE = 'carrito'
+    SALT = 'pedidos.carrito'
+    DURACION = 60 * 60 * 24 * 14
+
+    # Una cookie no puede pasar de ~4 KB
+    maximo_lineas = 100
+
+    def __init__(self, request):
+        self.request = request
+
+    def _usuario(self):
+        return self.request.user.pk or 0
+
+    def cargar(self):
+        token = self.request.COOKIES.get(self.NOMBRE_COOKIE)
+        if not token:
+            return {}
+        try:
+            datos = signing.loads(token, salt=self.SALT, max_age=self.DURACION)
+            if datos['u'] != self._usuario():
+                return {}
+            return {
+                str(bicicleta_id): {'cantidad': int(cantidad)}
+                for bicicleta_id, cantidad in datos['c'].items()
+            }
+        except (signing.BadSignature, KeyError, TypeError, ValueError, AttributeError):
+            return {}
+
+    def guardar(self, carrito):
+        if carrito:
+            datos = {
+                'u': self._usuario(),
+                'c': {bicicleta_id: item['cantidad'] for bicicleta_id, item in carrito.items()},
+            }
+            self.request._carrito_cookie = signing.dumps(datos, salt=self.SALT, compress=True)
+        else:
+            # Cadena vacía: el middleware borra la cookie
+            self.request._carrito_cookie = ''
+
+
+def obtener_almacenamiento(request):
+    """Instancia el backend configurado en CARRITO_ALMACENAMIENTO."""
+    ruta = getattr(settings, 'CARRITO_ALMACENAMIENTO', ALMACENAMIENTO_POR_DEFECTO)
+    return import_string(ruta)(request)
@@ -0,0 +1,52 @@
+"""
+Consultas de pedidos para los listados y el detalle.
+
+Los listados se paginan por cursor y traen cliente y vendedor en el mismo
+JOIN; el detalle y la factura precargan las líneas (con su bicicleta) y el
+historial (con quién hizo cada cambio). Así las plantillas no hacen una
+consulta por fila y el costo de una página no depende del total de pedidos.
+"""
+from productos.paginacion import paginar
+
+
+# El pk al final desempata para que el cursor identifique un pedido exacto.
+ORDEN_PEDIDOS = ('-fecha_creacion', '-pk')
+
+PEDIDOS_POR_PAGINA = 20
+
+
+def para_listado(queryset):
+    """Pedidos con cliente y vendedor resueltos en la misma consulta."""
+    return queryset.select_related('cliente', 'vendedor')
+
+
+def con_detalle(queryset):
+    """Pedidos con sus líneas e historial precargados."""
+    return para_listado(queryset).prefetch_related(
+        'detalles__bicicleta',
+        'historial_estados__cambiado_por',
+    )
+
+
+def paginar_pedidos(request, queryset, tamano=PEDIDOS_POR_PAGINA, parametro='cursor'):
+    """
+    Retorna (pagina, url_anterior, url_siguiente) para `queryset`, leyendo el
+    cursor del parámetro `parametro` de la petición. Los enlaces conservan
+    los demás parámetros, así que varios listados de una misma página se
+    paginan por separado usando parámetros distintos.
+    """
+    pagina = paginar(
+        para_listado(queryset),
+        ORDEN_PEDIDOS,
+        cursor=request.GET.get(parametro, '').strip(),
+        tamano=tamano,
+    )
+
+    def url(token):
+        if not token:
+            return None
+        query = request.GET.copy()
+        query[parametro] = token
+        return f'?{query.urlencode()}'
+
+    return pagina, url(pagina.anterior), url(pagina.siguiente)
@@ -0,0 +1,141 @@
+"""
+Contadores materializados de pedidos.
+
+ContadorPedidos guarda cuántos pedidos hay en cada estado por vendedor (y la
+suma de sus totales); ContadorDiario, cuántos pedidos entraron a cada estado
+cada día. Se actualizan en la misma transacción que crea, asigna o cambia
+de estado los pedidos, de modo que las métricas de los paneles leen unas
+pocas filas sin importar cuántos años de pedidos haya.
+
+Los cambios hechos por fuera de estas rutas (por ejemplo, borrar pedidos
+desde el admin de Django) descuadran los contadores; el comando
+`reconstruir_contadores` los vuelve a calcular desde los pedidos y su
+historial.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ContadorDiario, ContadorPedidos, HistorialEstadoPedido, Pedido
+
+
+def _sumar(estado, vendedor_id, cantidad, total):
+    contador = ContadorPedidos.objects.filter(estado=estado, vendedor_id=vendedor_id)
+    cambios = {'cantidad': F('cantidad') + cantidad, 'total': F('total') + total}
+    if contador.update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ContadorPedidos.objects.create(
+                estado=estado, vendedor_id=vendedor_id, cantidad=cantidad, total=total,
+            )
+    except IntegrityError:
+        # Otra transacción creó la fila primero
+        contador.update(**cambios)
+
+
+def _sumar_dia(fecha, estado, cantidad):
+    contador = ContadorDiario.objects.filter(fecha=fecha, estado=estado)
+    if contador.update(cantidad=F('cantidad') + cantidad):
+        return
+    try:
+        with transaction.atomic():
+            ContadorDiario.objects.create(fecha=fecha, estado=estado, cantidad=cantidad)
+    except IntegrityError:
+        contador.update(cantidad=F('cantidad') + cantidad)
+
+
+def _aplicar(movimientos):
+    """Aplica {(estado, vendedor_id): [cantidad, total]} en un orden fijo (evita interbloqueos)."""
+    for (estado, vendedor_id), (cantidad, total) in sorted(
+        movimientos.items(), key=lambda item: (item[0][0], item[0][1] or 0)
+    ):
+        if cantidad or total:
+            _sumar(estado, vendedor_id, cantidad, total)
+
+
+def registrar_creacion(pedido):
+    """Cuenta un pedido recién creado. Debe llamarse en la transacción que lo crea."""
+    _sumar(pedido.estado, pedido.vendedor_id, 1, pedido.total)
+    _sumar_dia(timezone.localdate(), pedido.estado, 1)
+
+
+def registrar_asignacion(pedido, vendedor_anterior_id):
+    """Mueve el pedido del contador de `vendedor_anterior_id` al de su vendedor actual."""
+    _aplicar({
+        (pedido.estado, vendedor_anterior_id): [-1, -pedido.total],
+        (pedido.estado, pedido.vendedor_id): [1, pedido.total],
+    })
+
+
+def registrar_transiciones(pedidos, anteriores, nuevo_estado):
+    """
+    Mueve los pedidos de su estado anterior ({pk: estado}) a `nuevo_estado`
+    y los suma al contador del día. Los pedidos con el mismo estado anterior
+    y vendedor se aplican juntos.
+    """
+    movimientos = defaultdict(lambda: [0, Decimal('0')])
+    for pedido in pedidos:
+        salida = movimientos[(anteriores[pedido.pk], pedido.vendedor_id)]
+        salida[0] -= 1
+        salida[1] -= pedido.total
+        entrada = movimientos[(nuevo_estado, pedido.vendedor_id)]
+        entrada[0] += 1
+        entrada[1] += pedido.total
+    _aplicar(movimientos)
+    if pedidos:
+        _sumar_dia(timezone.localdate(), nuevo_estado, len(pedidos))
+
+
+def reconstruir():
+    """
+    Recalcula todos los contadores: los de estado desde la tabla de pedidos
+    y los diarios desde las fechas de creación y el historial de estados.
+    Retorna cuántas filas de cada tipo quedaron.
+    """
+    zona = timezone.get_current_timezone()
+    with transaction.atomic():
+        por_estado = (
+            Pedido.objects.order_by()
+            .values_list('estado', 'vendedor_id')
+            .annotate(cantidad=Count('pk'), suma=Sum('total'))
+        )
+        diarios = Counter()
+        creados = (
+            Pedido.objects.order_by()
+            .annotate(dia=TruncDate('fecha_creacion', tzinfo=zona))
+            .values_list('dia')
+            .annotate(cantidad=Count('pk'))
+        )
+        for dia, cantidad in creados:
+            diarios[(dia, Pedido.Estado.PENDIENTE)] += cantidad
+        cambios = (
+            HistorialEstadoPedido.objects.order_by()
+            .annotate(dia=TruncDate('fecha', tzinfo=zona))
+            .values_list('dia', 'estado_nuevo')
+            .annotate(cantidad=Count('pk'))
+        )
+        for dia, estado, cantidad in cambios:
+            diarios[(dia, estado)] += cantidad
+
+        ContadorPedidos.objects.all().delete()
+        ContadorDiario.objects.all().delete()
+        contadores = ContadorPedidos.objects.bulk_create(
+            [
+                ContadorPedidos(estado=estado, vendedor_id=vendedor_id, cantidad=cantidad, total=suma or 0)
+                for estado, vendedor_id, cantidad, suma in por_estado
+            ],
+            batch_size=500,
+        )
+        dias = ContadorDiario.objects.bulk_create(
+            [
+                ContadorDiario(fecha=dia, estado=estado, cantidad=cantidad)
+                for (dia, estado), cantidad in diarios.items()
+            ],
+            batch_size=500,
+        )
+    return {'contadores': len(contadores), 'dias': len(dias)}
@@ -1,11 +1,14 @@
 """
 Context processors para la aplicación pedidos.
 """
-from .carrito import Carrito
+from django.utils.functional import SimpleLazyObject
+
+from .carrito import obtener_carrito
 
 
 def carrito(request):
     """
     Context processor que hace el carrito disponible en todos los templates.
+    Es perezoso: la sesión solo se lee si el template usa el carrito.
     """
-    return {'carrito': Carrito(request)}
+    return {'carrito': SimpleLazyObject(lambda: obtener_carrito(request))}
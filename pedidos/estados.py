@@ -0,0 +1,215 @@
+"""
+Máquina de estados de los pedidos.
+
+Las transiciones permitidas, quién puede hacer cada una y los efectos al
+entrar a un estado se definen aquí, en tablas. Todo cambio de estado pasa
+por `transicionar_varios()`, que valida un lote de pedidos, los actualiza
+con un solo UPDATE, ajusta los contadores materializados y registra el
+historial con un solo bulk_create; `transicionar()` es el caso de un pedido.
+
+El flujo normal es Pendiente -> Confirmado -> Despachado -> En Camino ->
+Entregado; desde cualquier estado no final el pedido se puede cancelar.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import contadores
+from .models import HistorialEstadoPedido, Pedido, ReservaStock
+
+
+Estado = Pedido.Estado
+
+TRANSICIONES = {
+    Estado.PENDIENTE: {Estado.CONFIRMADO, Estado.CANCELADO},
+    Estado.CONFIRMADO: {Estado.DESPACHADO, Estado.CANCELADO},
+    Estado.DESPACHADO: {Estado.EN_CAMINO, Estado.CANCELADO},
+    Estado.EN_CAMINO: {Estado.ENTREGADO, Estado.CANCELADO},
+    Estado.ENTREGADO: set(),
+    Estado.CANCELADO: set(),
+}
+
+
+class TransicionInvalida(Exception):
+    """El pedido no puede pasar al estado pedido, o el usuario no puede moverlo."""
+
+    def __init__(self, pedido, mensaje):
+        self.pedido = pedido
+        super().__init__(mensaje)
+
+
+# ------------------------------------------------------------
+# Permisos por estado destino
+# ------------------------------------------------------------
+
+def _vendedor_asignado(usuario, pedido, anterior):
+    return usuario.es_vendedor and pedido.vendedor_id == usuario.pk
+
+
+def _bodeguero(usuario, pedido, anterior):
+    return usuario.es_bodeguero
+
+
+def _puede_cancelar(usuario, pedido, anterior):
+    if usuario.es_vendedor:
+        # El vendedor cancela antes del despacho, si el pedido es suyo o está libre
+        return (
+            pedido.vendedor_id in (None, usuario.pk)
+            and anterior in (Estado.PENDIENTE, Estado.CONFIRMADO)
+        )
+    if usuario.es_cliente:
+        return pedido.cliente_id == usuario.pk and anterior == Estado.PENDIENTE
+    return False
+
+
+# El administrador puede hacer cualquier transición de la tabla
+PERMISOS = {
+    Estado.CONFIRMADO: _vendedor_asignado,
+    Estado.DESPACHADO: _bodeguero,
+    Estado.EN_CAMINO: _vendedor_asignado,
+    Estado.ENTREGADO: _vendedor_asignado,
+    Estado.CANCELADO: _puede_cancelar,
+}
+
+
+# ------------------------------------------------------------
+# Efectos al entrar a un estado
+# ------------------------------------------------------------
+# Reciben los pedidos ya validados, {pk: estado anterior} y el usuario, y
+# corren dentro de la transacción del cambio: si alguno falla no se aplica
+# nada.
+
+def _descontar_stock(pedidos, anteriores, usuario):
+    from .servicios import descontar_stock_varios
+    descontar_stock_varios(pedidos)
+
+
+def _restaurar_stock(pedidos, anteriores, usuario):
+    from .servicios import restaurar_stock_varios
+    # Solo los que ya habían descontado stock al despacharse
+    despachados = [pedido for pedido in pedidos if anteriores[pedido.pk] == Estado.DESPACHADO]
+    if despachados:
+        restaurar_stock_varios(despachados)
+
+
+def _liberar_reservas(pedidos, anteriores, usuario):
+    # Al despachar el stock ya se descontó; al cancelar se devuelve
+    ReservaStock.objects.filter(pedido__in=pedidos).delete()
+
+
+EFECTOS = {
+    Estado.DESPACHADO: [_descontar_stock, _liberar_reservas],
+    Estado.CANCELADO: [_restaurar_stock, _liberar_reservas],
+}
+
+
+# ------------------------------------------------------------
+# API
+# ------------------------------------------------------------
+
+def motivo_rechazo(pedido, nuevo_estado, usuario):
+    """Retorna por qué `usuario` no puede pasar `pedido` a `nuevo_estado`, o None si puede."""
+    anterior = pedido.estado
+    if nuevo_estado not in Estado.values:
+        return 'Estado no válido.'
+    if nuevo_estado not in TRANSICIONES.get(anterior, ()):
+        return (
+            f'El pedido #{pedido.pk} no puede pasar de {Estado(anterior).label} '
+            f'a {Estado(nuevo_estado).label}.'
+        )
+    if usuario is None or usuario.es_admin:
+        return None
+    if not PERMISOS[nuevo_estado](usuario, pedido, anterior):
+        return f'No tienes permiso para pasar el pedido #{pedido.pk} a {Estado(nuevo_estado).label}.'
+    return None
+
+
+def puede(usuario, pedido, nuevo_estado):
+    return motivo_rechazo(pedido, nuevo_estado, usuario) is None
+
+
+def siguientes(pedido, usuario):
+    """Estados a los que `usuario` puede pasar el pedido, como (valor, etiqueta)."""
+    return [
+        (estado.value, estado.label)
+        for estado in Estado
+        if estado in TRANSICIONES[pedido.estado] and puede(usuario, pedido, estado)
+    ]
+
+
+class ResultadoTransicion:
+    """Pedidos que cambiaron de estado y {pk: motivo} de los rechazados."""
+
+    def __init__(self, aplicados, rechazados):
+        self.aplicados = aplicados
+        self.rechazados = rechazados
+
+
+def transicionar_varios(pedidos, nuevo_estado, usuario, notas=''):
+    """
+    Pasa varios pedidos a `nuevo_estado` en una transacción.
+
+    Bloquea las filas y valida cada pedido contra su estado actual en la
+    base de datos; los que no pueden cambiar se omiten y se reportan en
+    `rechazados`. Los válidos se actualizan con un solo UPDATE, corren los
+    efectos del estado destino y el historial se inserta con un bulk_create.
+    Si un efecto falla (por ejemplo StockInsuficiente al despachar) se
+    revierte todo el lote.
+
+    Las instancias recibidas que cambiaron quedan con el nuevo estado.
+    """
+    recibidos = {pedido.pk: pedido for pedido in pedidos}
+    rechazados = {}
+    with transaction.atomic():
+        actuales = Pedido.objects.select_for_update().order_by('pk').in_bulk(recibidos.keys())
+
+        validos = []
+        for pk in recibidos:
+            pedido = actuales.get(pk)
+            motivo = (
+                motivo_rechazo(pedido, nuevo_estado, usuario) if pedido is not None
+                else f'El pedido #{pk} no existe.'
+            )
+            if motivo:
+                rechazados[pk] = motivo
+            else:
+                validos.append(pedido)
+
+        if validos:
+            anteriores = {pedido.pk: pedido.estado for pedido in validos}
+            ahora = timezone.now()
+            Pedido.objects.filter(pk__in=anteriores.keys()).update(
+                estado=nuevo_estado,
+                fecha_actualizacion=ahora,
+            )
+            contadores.registrar_transiciones(validos, anteriores, nuevo_estado)
+            for efecto in EFECTOS.get(nuevo_estado, ()):
+                efecto(validos, anteriores, usuario)
+            HistorialEstadoPedido.objects.bulk_create(
+                [
+                    HistorialEstadoPedido(
+                        pedido=pedido,
+                        estado_anterior=anteriores[pedido.pk],
+                        estado_nuevo=nuevo_estado,
+                        cambiado_por=usuario,
+                        notas=notas or f'Cambio de {anteriores[pedido.pk]} a {nuevo_estado}',
+                    )
+                    for pedido in validos
+                ],
+                batch_size=500,
+            )
+
+    aplicados = []
+    for pedido in validos:
+        original = recibidos[pedido.pk]
+        original.estado = nuevo_estado
+        original.fecha_actualizacion = ahora
+        aplicados.append(original)
+    return ResultadoTransicion(aplicados, rechazados)
+
+
+def transicionar(pedido, nuevo_estado, usuario, notas=''):
+    """Pasa un pedido a `nuevo_estado`. Lanza TransicionInvalida si no puede."""
+    resultado = transicionar_varios([pedido], nuevo_estado, usuario, notas)
+    if resultado.rechazados:
+        raise TransicionInvalida(pedido, resultado.rechazados[pedido.pk])
+    return pedido
@@ -0,0 +1,145 @@
+"""
+Idempotencia para POSTs que crean o cambian pedidos.
+
+El formulario (o el cliente de la API) envía una clave única por intento en
+el campo `clave_idempotencia` o en la cabecera `Idempotency-Key`. La primera
+petición con esa clave ejecuta la vista y guarda su respuesta; los
+reintentos (doble clic, reenvío en redes móviles) reciben la misma respuesta
+sin volver a ejecutarla, incluidas las cookies que cambió (por ejemplo, el
+carrito vaciado por el checkout). Mientras la primera sigue en curso, los
+reintentos reciben 409; si lleva más de IDEMPOTENCIA_EN_CURSO_SEGUNDOS sin
+terminar (el proceso murió), se descarta y el reintento se ejecuta.
+"""
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .middleware import escribir_cookie_carrito
+from .models import RespuestaIdempotente
+
+
+CAMPO = 'clave_idempotencia'
+
+CABECERA = 'Idempotency-Key'
+
+
+def duracion():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCIA_HORAS', 24))
+
+
+def limite_en_curso():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_EN_CURSO_SEGUNDOS', 60))
+
+
+def _cookies(response):
+    """Cookies de la respuesta como {nombre: {'value': ..., atributos}}."""
+    return {
+        nombre: {'value': morsel.value, **{clave: valor for clave, valor in morsel.items() if valor != ''}}
+        for nombre, morsel in response.cookies.items()
+    }
+
+
+def _clave(request):
+    clave = request.headers.get(CABECERA) or request.POST.get(CAMPO) or ''
+    return clave.strip()[:64]
+
+
+def _reproducir(request, guardada):
+    if guardada.codigo is None:
+        return HttpResponse('La solicitud original aún se está procesando.', status=409)
+    response = HttpResponse(
+        bytes(guardada.contenido),
+        status=guardada.codigo,
+        content_type=guardada.tipo_contenido or None,
+    )
+    if guardada.ubicacion:
+        response['Location'] = guardada.ubicacion
+        messages.info(request, 'Esta solicitud ya había sido procesada.')
+    for nombre, atributos in (guardada.cookies or {}).items():
+        atributos = dict(atributos)
+        response.cookies[nombre] = atributos.pop('value')
+        response.cookies[nombre].update(atributos)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(vista):
+    """
+    Decorador para vistas POST. Sin clave, o para usuarios anónimos, la
+    vista se ejecuta normalmente.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = _clave(request)
+        if request.method != 'POST' or not clave or not request.user.is_authenticated:
+            return vista(request, *args, **kwargs)
+        
+        ahora = timezone.now()
+        guardada = RespuestaIdempotente.objects.filter(usuario=request.user, clave=clave).first()
+        if guardada is not None and (
+            guardada.expira <= ahora
+            or (guardada.codigo is None and guardada.fecha_creacion <= ahora - limite_en_curso())
+        ):
+            # Vencida, o abandonada a medias: se descarta y se vuelve a ejecutar
+            RespuestaIdempotente.objects.filter(pk=guardada.pk, codigo=guardada.codigo).delete()
+            guardada = None
+        if guardada is not None:
+            if guardada.ruta != request.path:
+                return HttpResponse('La clave de idempotencia ya se usó en otra operación.', status=422)
+            return _reproducir(request, guardada)
+        
+        try:
+            with transaction.atomic():
+                guardada = RespuestaIdempotente.objects.create(
+                    usuario=request.user,
+                    clave=clave,
+                    ruta=request.path,
+                    fecha_creacion=ahora,
+                    expira=ahora + duracion(),
+                )
+        except IntegrityError:
+            # Otra petición con la misma clave se registró primero
+            guardada = RespuestaIdempotente.objects.get(usuario=request.user, clave=clave)
+            return _reproducir(request, guardada)
+        
+        try:
+            response = vista(request, *args, **kwargs)
+        except Exception:
+            guardada.delete()
+            raise
+        
+        if response.status_code >= 500 or response.streaming:
+            # No se guarda: el cliente puede reintentar con la misma clave
+            guardada.delete()
+            return response
+        
+        # La cookie del carrito se escribe ya, para guardarla con la respuesta
+        escribir_cookie_carrito(request, response)
+        guardada.codigo = response.status_code
+        guardada.tipo_contenido = response.get('Content-Type', '')
+        guardada.ubicacion = response.get('Location', '')
+        guardada.contenido = response.content
+        guardada.cookies = _cookies(response)
+        guardada.save(update_fields=['codigo', 'tipo_contenido', 'ubicacion', 'contenido', 'cookies'])
+        return response
+    
+    return envoltura
+
+
+def purgar_vencidas(lote=1000):
+    """Borra las respuestas vencidas, por lotes. Retorna cuántas borró."""
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            RespuestaIdempotente.objects.filter(expira__lte=ahora)
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += RespuestaIdempotente.objects.filter(pk__in=ids).delete()[0]
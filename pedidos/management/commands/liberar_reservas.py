@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pedidos import reservas
+
+
+class Command(BaseCommand):
+    help = 'Borra las reservas de stock de carritos que ya vencieron.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Reservas borradas por consulta (por defecto 1000).',
+        )
+    
+    def handle(self, *args, **options):
+        total = reservas.liberar_vencidas(lote=max(1, options['lote']))
+        self.stdout.write(self.style.SUCCESS(f'Reservas vencidas liberadas: {total}.'))
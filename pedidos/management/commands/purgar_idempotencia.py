@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pedidos import idempotencia
+
+
+class Command(BaseCommand):
+    help = 'Borra las respuestas idempotentes guardadas que ya vencieron.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Respuestas borradas por consulta (por defecto 1000).',
+        )
+    
+    def handle(self, *args, **options):
+        total = idempotencia.purgar_vencidas(lote=max(1, options['lote']))
+        self.stdout.write(self.style.SUCCESS(f'Respuestas idempotentes purgadas: {total}.'))
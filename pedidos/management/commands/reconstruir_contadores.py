@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pedidos import contadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de pedidos por estado, vendedor y día.'
+    
+    def handle(self, *args, **options):
+        resultado = contadores.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores reconstruidos: {resultado['contadores']} por estado y vendedor, "
+            f"{resultado['dias']} diarios."
+        ))
@@ -0,0 +1,112 @@
+"""
+Métricas de los paneles (lista de pedidos, bodega y dashboard del admin).
+
+Las cifras por estado, vendedor y día se leen de los contadores
+materializados (pedidos.contadores): unas pocas filas, sin importar cuántos
+pedidos haya. Las del cliente y las de inventario se resuelven con un solo
+aggregate() usando Count/Sum con `filter=`.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Avg, Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from productos.models import Bicicleta
+from .models import ContadorDiario, ContadorPedidos, Pedido
+
+
+ESTADOS_EN_PROCESO = (
+    Pedido.Estado.CONFIRMADO,
+    Pedido.Estado.DESPACHADO,
+    Pedido.Estado.EN_CAMINO,
+)
+
+# Stock por debajo del cual una bicicleta se considera "bajo stock"
+UMBRAL_BAJO_STOCK = 3
+
+
+def _contar(**filtro):
+    return Count('pk', filter=Q(**filtro))
+
+
+def metricas_cliente(usuario):
+    datos = Pedido.objects.filter(cliente=usuario).aggregate(
+        pendientes=_contar(estado=Pedido.Estado.PENDIENTE),
+        en_proceso=_contar(estado__in=ESTADOS_EN_PROCESO),
+        entregados=_contar(estado=Pedido.Estado.ENTREGADO),
+        total_compras=Sum('total', filter=Q(estado=Pedido.Estado.ENTREGADO)),
+    )
+    datos['total_compras'] = datos['total_compras'] or 0
+    return datos
+
+
+def _por_estado(contadores):
+    """{estado: cantidad} y {estado: total} sumando las filas de contadores dadas."""
+    cantidades = defaultdict(int)
+    totales = defaultdict(Decimal)
+    for estado, cantidad, total in contadores.values_list('estado', 'cantidad', 'total'):
+        cantidades[estado] += cantidad
+        totales[estado] += total
+    return cantidades, totales
+
+
+def metricas_vendedor(usuario):
+    sin_asignar = Q(estado=Pedido.Estado.PENDIENTE, vendedor__isnull=True)
+    filas = ContadorPedidos.objects.filter(Q(vendedor=usuario) | sin_asignar)
+    propios = defaultdict(int)
+    libres = 0
+    for estado, vendedor_id, cantidad in filas.values_list('estado', 'vendedor_id', 'cantidad'):
+        if vendedor_id is None:
+            libres += cantidad
+        else:
+            propios[estado] += cantidad
+    return {
+        'sin_asignar': libres,
+        'pendientes': propios[Pedido.Estado.PENDIENTE],
+        'confirmados': propios[Pedido.Estado.CONFIRMADO],
+        'despachados': propios[Pedido.Estado.DESPACHADO],
+        'en_camino': propios[Pedido.Estado.EN_CAMINO],
+        'entregados_total': propios[Pedido.Estado.ENTREGADO],
+    }
+
+
+def metricas_bodega():
+    cantidades, _ = _por_estado(ContadorPedidos.objects.filter(estado=Pedido.Estado.CONFIRMADO))
+    despachados_hoy = ContadorDiario.objects.filter(
+        fecha=timezone.localdate(), estado=Pedido.Estado.DESPACHADO,
+    ).values_list('cantidad', flat=True).first()
+    return {
+        'para_despachar': cantidades[Pedido.Estado.CONFIRMADO],
+        'despachados_hoy': despachados_hoy or 0,
+    }
+
+
+def metricas_admin():
+    cantidades, totales = _por_estado(ContadorPedidos.objects.all())
+    return {
+        'total_pedidos': sum(cantidades.values()),
+        'pendientes': cantidades[Pedido.Estado.PENDIENTE],
+        'confirmados': cantidades[Pedido.Estado.CONFIRMADO],
+        'despachados': cantidades[Pedido.Estado.DESPACHADO],
+        'en_camino': cantidades[Pedido.Estado.EN_CAMINO],
+        'entregados': cantidades[Pedido.Estado.ENTREGADO],
+        'ingresos_totales': totales[Pedido.Estado.ENTREGADO],
+    }
+
+
+def metricas_inventario():
+    """Contadores de las bicicletas activas y su margen de ganancia promedio."""
+    margen = Case(
+        When(costo__gt=0, then=(F('precio') - F('costo')) * Value(100) / F('costo')),
+        default=Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    datos = Bicicleta.objects.filter(activo=True).aggregate(
+        total_productos=Count('pk'),
+        bajo_stock=_contar(stock__lt=UMBRAL_BAJO_STOCK),
+        sin_stock=_contar(stock=0),
+        margen_promedio=Avg(margen),
+    )
+    datos['margen_promedio'] = datos['margen_promedio'] or 0
+    return datos
@@ -0,0 +1,44 @@
+"""
+Middleware de la aplicación pedidos.
+"""
+from django.conf import settings
+
+from .carrito.almacenamiento import AlmacenamientoCookie
+
+
+class CarritoCookieMiddleware:
+    """
+    Escribe en la respuesta la cookie del carrito cuando
+    AlmacenamientoCookie la modificó durante la petición.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        escribir_cookie_carrito(request, response)
+        return response
+
+
+def escribir_cookie_carrito(request, response):
+    """
+    Escribe (o borra) en `response` la cookie pendiente del carrito. Solo lo
+    hace una vez por petición: el decorador de idempotencia la escribe antes
+    de guardar la respuesta, y entonces el middleware ya no tiene nada que hacer.
+    """
+    valor = getattr(request, '_carrito_cookie', None)
+    if valor is None:
+        return
+    request._carrito_cookie = None
+    if valor:
+        response.set_cookie(
+            AlmacenamientoCookie.NOMBRE_COOKIE,
+            valor,
+            max_age=AlmacenamientoCookie.DURACION,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+    else:
+        response.delete_cookie(AlmacenamientoCookie.NOMBRE_COOKIE, samesite='Lax')
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialestadopedido',
+            name='estado_anterior',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('despachado', 'Despachado'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado Anterior'),
+        ),
+        migrations.AlterField(
+            model_name='historialestadopedido',
+            name='estado_nuevo',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('despachado', 'Despachado'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado Nuevo'),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('despachado', 'Despachado'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], default='pendiente', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'estado'], name='pedido_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['vendedor', 'estado'], name='pedido_vendedor_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', '-fecha_creacion'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_actualizacion'], name='pedido_estado_actualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('vendedor__isnull', True)), fields=['estado', '-fecha_creacion'], name='pedido_sin_asignar_idx'),
+        ),
+    ]
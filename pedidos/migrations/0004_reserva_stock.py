@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_indices_consultas'),
+        ('productos', '0006_indice_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('expira', models.DateTimeField(blank=True, help_text='Vacío si la reserva ya pertenece a un pedido', null=True, verbose_name='Expira')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('bicicleta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='productos.bicicleta', verbose_name='Bicicleta')),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='pedidos.pedido', verbose_name='Pedido')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_stock', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'indexes': [models.Index(fields=['expira'], name='reserva_expira_idx'), models.Index(fields=['bicicleta', 'expira'], name='reserva_bicicleta_expira_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('pedido__isnull', True)), fields=('usuario', 'bicicleta'), name='reserva_carrito_unica')],
+            },
+        ),
+    ]
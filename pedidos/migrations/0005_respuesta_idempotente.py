@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_reserva_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, verbose_name='Clave')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('codigo', models.PositiveSmallIntegerField(blank=True, help_text='Vacío mientras la primera petición se está procesando', null=True, verbose_name='Código HTTP')),
+                ('tipo_contenido', models.CharField(blank=True, max_length=100, verbose_name='Content-Type')),
+                ('ubicacion', models.CharField(blank=True, max_length=500, verbose_name='Location')),
+                ('contenido', models.BinaryField(blank=True, default=b'', verbose_name='Contenido')),
+                ('expira', models.DateTimeField(verbose_name='Expira')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respuestas_idempotentes', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Respuesta Idempotente',
+                'verbose_name_plural': 'Respuestas Idempotentes',
+                'indexes': [models.Index(fields=['expira'], name='idempotencia_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='idempotencia_usuario_clave')],
+            },
+        ),
+    ]
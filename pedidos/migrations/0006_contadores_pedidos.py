@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_contadores(apps, schema_editor):
+    # Los contadores diarios se reconstruyen con `reconstruir_contadores`
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    ContadorPedidos = apps.get_model('pedidos', 'ContadorPedidos')
+    filas = (
+        Pedido.objects.values('estado', 'vendedor')
+        .annotate(cantidad=Count('pk'), suma=Sum('total'))
+        .order_by()
+    )
+    ContadorPedidos.objects.bulk_create(
+        ContadorPedidos(
+            estado=fila['estado'],
+            vendedor_id=fila['vendedor'],
+            cantidad=fila['cantidad'],
+            total=fila['suma'] or 0,
+        )
+        for fila in filas
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_respuesta_idempotente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('despachado', 'Despachado'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+            ],
+            options={
+                'verbose_name': 'Contador Diario',
+                'verbose_name_plural': 'Contadores Diarios',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'estado'), name='contador_diario_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContadorPedidos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('despachado', 'Despachado'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20, verbose_name='Estado')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('vendedor', models.ForeignKey(blank=True, help_text='Vacío para los pedidos sin vendedor asignado', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='contadores_pedidos', to=settings.AUTH_USER_MODEL, verbose_name='Vendedor')),
+            ],
+            options={
+                'verbose_name': 'Contador de Pedidos',
+                'verbose_name_plural': 'Contadores de Pedidos',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('vendedor__isnull', False)), fields=('estado', 'vendedor'), name='contador_estado_vendedor'), models.UniqueConstraint(condition=models.Q(('vendedor__isnull', True)), fields=('estado',), name='contador_estado_sin_vendedor')],
+            },
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
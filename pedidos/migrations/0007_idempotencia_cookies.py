@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0006_contadores_pedidos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuestaidempotente',
+            name='cookies',
+            field=models.JSONField(blank=True, default=dict, help_text='Cookies que la primera respuesta creó o borró (p. ej. el carrito)', verbose_name='Cookies'),
+        ),
+        migrations.AddField(
+            model_name='respuestaidempotente',
+            name='fecha_creacion',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Creación'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from productos.models import Bicicleta
 
 
@@ -69,6 +70,18 @@ class Pedido(models.Model):
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['cliente', 'estado'], name='pedido_cliente_estado_idx'),
+            models.Index(fields=['vendedor', 'estado'], name='pedido_vendedor_estado_idx'),
+            models.Index(fields=['estado', '-fecha_creacion'], name='pedido_estado_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_actualizacion'], name='pedido_estado_actualiz_idx'),
+            # Cola de pedidos sin vendedor asignado (pendientes)
+            models.Index(
+                fields=['estado', '-fecha_creacion'],
+                condition=models.Q(vendedor__isnull=True),
+                name='pedido_sin_asignar_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"Pedido #{self.pk} - {self.cliente.username} - {self.get_estado_display()}"
@@ -80,22 +93,14 @@ class Pedido(models.Model):
         self.save(update_fields=['total'])
         return total
     
-    def cambiar_estado(self, nuevo_estado, usuario):
+    def cambiar_estado(self, nuevo_estado, usuario, notas=''):
         """
         Cambia el estado del pedido y registra en el historial.
+        Las reglas y efectos de cada transición están en pedidos.estados;
+        lanza estados.TransicionInvalida si el cambio no está permitido.
         """
-        estado_anterior = self.estado
-        self.estado = nuevo_estado
-        self.save(update_fields=['estado'])
-        
-        # Registrar en historial de auditoría
-        HistorialEstadoPedido.objects.create(
-            pedido=self,
-            estado_anterior=estado_anterior,
-            estado_nuevo=nuevo_estado,
-            cambiado_por=usuario,
-            notas=f"Cambio de {estado_anterior} a {nuevo_estado}"
-        )
+        from . import estados
+        estados.transicionar(self, nuevo_estado, usuario, notas)
         return True
 
 
@@ -188,3 +193,216 @@ class HistorialEstadoPedido(models.Model):
     
     def __str__(self):
         return f"Pedido #{self.pedido.pk}: {self.estado_anterior} -> {self.estado_nuevo}"
+
+
+class ReservaStock(models.Model):
+    """
+    Reserva temporal de unidades de una bicicleta.
+
+    Mientras una bicicleta está en el carrito, sus unidades quedan apartadas
+    hasta `expira`. Al hacer checkout la reserva pasa al pedido (sin
+    vencimiento) y se libera cuando el pedido se despacha o se cancela.
+    """
+    
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='reservas_stock',
+        verbose_name='Usuario'
+    )
+    bicicleta = models.ForeignKey(
+        Bicicleta,
+        on_delete=models.CASCADE,
+        related_name='reservas',
+        verbose_name='Bicicleta'
+    )
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reservas',
+        verbose_name='Pedido'
+    )
+    cantidad = models.PositiveIntegerField(
+        verbose_name='Cantidad'
+    )
+    expira = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Expira',
+        help_text='Vacío si la reserva ya pertenece a un pedido'
+    )
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Reserva de Stock'
+        verbose_name_plural = 'Reservas de Stock'
+        constraints = [
+            # Una sola reserva de carrito por usuario y bicicleta
+            models.UniqueConstraint(
+                fields=['usuario', 'bicicleta'],
+                condition=models.Q(pedido__isnull=True),
+                name='reserva_carrito_unica',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['expira'], name='reserva_expira_idx'),
+            models.Index(fields=['bicicleta', 'expira'], name='reserva_bicicleta_expira_idx'),
+        ]
+    
+    def __str__(self):
+        destino = f"pedido #{self.pedido_id}" if self.pedido_id else f"hasta {self.expira:%Y-%m-%d %H:%M}"
+        return f"{self.cantidad}x {self.bicicleta_id} para {self.usuario_id} ({destino})"
+
+
+class RespuestaIdempotente(models.Model):
+    """
+    Primera respuesta a un POST enviado con clave de idempotencia. Si el
+    cliente reintenta con la misma clave se devuelve esta respuesta sin
+    volver a ejecutar la vista.
+    """
+    
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='respuestas_idempotentes',
+        verbose_name='Usuario'
+    )
+    clave = models.CharField(
+        max_length=64,
+        verbose_name='Clave'
+    )
+    ruta = models.CharField(
+        max_length=255,
+        verbose_name='Ruta'
+    )
+    codigo = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Código HTTP',
+        help_text='Vacío mientras la primera petición se está procesando'
+    )
+    tipo_contenido = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Content-Type'
+    )
+    ubicacion = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name='Location'
+    )
+    contenido = models.BinaryField(
+        blank=True,
+        default=b'',
+        verbose_name='Contenido'
+    )
+    cookies = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Cookies',
+        help_text='Cookies que la primera respuesta creó o borró (p. ej. el carrito)'
+    )
+    fecha_creacion = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Fecha de Creación'
+    )
+    expira = models.DateTimeField(
+        verbose_name='Expira'
+    )
+    
+    class Meta:
+        verbose_name = 'Respuesta Idempotente'
+        verbose_name_plural = 'Respuestas Idempotentes'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='idempotencia_usuario_clave'),
+        ]
+        indexes = [
+            models.Index(fields=['expira'], name='idempotencia_expira_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.clave} ({self.ruta})"
+
+
+class ContadorPedidos(models.Model):
+    """
+    Cantidad de pedidos (y suma de sus totales) en cada estado por vendedor.
+    Se mantiene en cada creación, asignación y cambio de estado
+    (pedidos.contadores), así las métricas no recorren la tabla de pedidos.
+    """
+    
+    estado = models.CharField(
+        max_length=20,
+        choices=Pedido.Estado.choices,
+        verbose_name='Estado'
+    )
+    vendedor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='contadores_pedidos',
+        verbose_name='Vendedor',
+        help_text='Vacío para los pedidos sin vendedor asignado'
+    )
+    cantidad = models.IntegerField(
+        default=0,
+        verbose_name='Cantidad'
+    )
+    total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Total'
+    )
+    
+    class Meta:
+        verbose_name = 'Contador de Pedidos'
+        verbose_name_plural = 'Contadores de Pedidos'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['estado', 'vendedor'],
+                condition=models.Q(vendedor__isnull=False),
+                name='contador_estado_vendedor',
+            ),
+            models.UniqueConstraint(
+                fields=['estado'],
+                condition=models.Q(vendedor__isnull=True),
+                name='contador_estado_sin_vendedor',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.estado} / {self.vendedor_id or '-'}: {self.cantidad}"
+
+
+class ContadorDiario(models.Model):
+    """Pedidos que entraron a cada estado en un día (creados, despachados, ...)."""
+    
+    fecha = models.DateField(
+        verbose_name='Fecha'
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=Pedido.Estado.choices,
+        verbose_name='Estado'
+    )
+    cantidad = models.IntegerField(
+        default=0,
+        verbose_name='Cantidad'
+    )
+    
+    class Meta:
+        verbose_name = 'Contador Diario'
+        verbose_name_plural = 'Contadores Diarios'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='contador_diario_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} {self.estado}: {self.cantidad}"
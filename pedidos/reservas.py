@@ -0,0 +1,113 @@
+"""
+Reservas temporales de stock.
+
+Al agregar una bicicleta al carrito se apartan sus unidades durante
+RESERVA_STOCK_MINUTOS. El stock disponible para los demás clientes es el
+stock menos las reservas activas (de carritos sin vencer o de pedidos aún no
+despachados), calculado en la misma consulta de las bicicletas.
+
+Las reservas vencidas no afectan el cálculo; el comando `liberar_reservas`
+las borra por lotes para que la tabla no crezca.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from productos.models import Bicicleta
+from .models import ReservaStock
+
+
+def duracion():
+    return timedelta(minutes=getattr(settings, 'RESERVA_STOCK_MINUTOS', 15))
+
+
+def _activas(ahora=None):
+    """Reservas que apartan stock: de pedidos o de carritos sin vencer."""
+    ahora = ahora or timezone.now()
+    return ReservaStock.objects.filter(Q(pedido__isnull=False) | Q(expira__gt=ahora))
+
+
+def con_stock_disponible(queryset, usuario=None):
+    """
+    Anota un queryset de Bicicleta con `stock_reservado` y
+    `stock_disponible`. Las reservas del carrito de `usuario` no se restan,
+    porque son las suyas.
+    """
+    reservas = _activas().filter(bicicleta=OuterRef('pk'))
+    if usuario is not None and usuario.pk:
+        reservas = reservas.exclude(usuario=usuario, pedido__isnull=True)
+    reservado = reservas.values('bicicleta').annotate(total=Sum('cantidad')).values('total')
+    return queryset.annotate(
+        stock_reservado=Coalesce(Subquery(reservado), Value(0)),
+    ).annotate(
+        stock_disponible=F('stock') - F('stock_reservado'),
+    )
+
+
+def disponibles(bicicleta_ids, usuario=None, bloquear=False):
+    """
+    Retorna {bicicleta_id: unidades disponibles} en una sola consulta.
+    Con bloquear=True las filas de las bicicletas quedan bloqueadas hasta
+    el final de la transacción.
+    """
+    queryset = Bicicleta.objects.filter(pk__in=bicicleta_ids)
+    if bloquear:
+        queryset = queryset.select_for_update()
+    return dict(con_stock_disponible(queryset, usuario).values_list('pk', 'stock_disponible'))
+
+
+def reservar(usuario, cantidades):
+    """
+    Crea o renueva las reservas del carrito de `usuario`.
+    `cantidades` es {bicicleta_id: cantidad total en el carrito}.
+    """
+    if not usuario.pk or not cantidades:
+        return
+    expira = timezone.now() + duracion()
+    ReservaStock.objects.filter(
+        usuario=usuario, pedido__isnull=True, bicicleta_id__in=cantidades.keys()
+    ).delete()
+    ReservaStock.objects.bulk_create([
+        ReservaStock(usuario=usuario, bicicleta_id=bicicleta_id, cantidad=cantidad, expira=expira)
+        for bicicleta_id, cantidad in cantidades.items()
+    ])
+
+
+def liberar(usuario, bicicleta_ids=None):
+    """Libera las reservas del carrito de `usuario` (todas o las de esas bicicletas)."""
+    if not usuario.pk:
+        return
+    reservas = ReservaStock.objects.filter(usuario=usuario, pedido__isnull=True)
+    if bicicleta_ids is not None:
+        reservas = reservas.filter(bicicleta_id__in=bicicleta_ids)
+    reservas.delete()
+
+
+def convertir(usuario, pedido, cantidades):
+    """
+    Pasa al pedido las reservas del carrito: a partir de aquí no vencen y
+    se liberan al despachar o cancelar el pedido. Debe llamarse dentro de
+    la transacción que crea el pedido.
+    """
+    liberar(usuario)
+    ReservaStock.objects.bulk_create([
+        ReservaStock(usuario=usuario, bicicleta_id=bicicleta_id, cantidad=cantidad, pedido=pedido)
+        for bicicleta_id, cantidad in cantidades.items()
+    ])
+
+
+def liberar_vencidas(lote=1000):
+    """Borra las reservas de carrito vencidas, por lotes. Retorna cuántas borró."""
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            ReservaStock.objects.filter(pedido__isnull=True, expira__lte=ahora)
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += ReservaStock.objects.filter(pk__in=ids).delete()[0]
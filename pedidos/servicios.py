@@ -0,0 +1,172 @@
+"""
+Operaciones de pedidos que modifican varias tablas a la vez.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from productos import cache as cache_catalogo
+from productos.models import Bicicleta
+from productos.precios import con_precio_efectivo, precio_efectivo
+from . import contadores, estados, reservas
+from .models import DetallePedido, Pedido
+
+
+class StockInsuficiente(Exception):
+    """No hay unidades disponibles para una línea del pedido."""
+
+    def __init__(self, bicicleta, disponible, requerido=None):
+        self.bicicleta = bicicleta
+        self.disponible = max(disponible, 0)
+        self.requerido = requerido
+        mensaje = (
+            f'No hay suficiente stock de {bicicleta.marca} {bicicleta.modelo}. '
+            f'Disponible: {self.disponible}'
+        )
+        if requerido is not None:
+            mensaje += f', Requerido: {requerido}'
+        super().__init__(mensaje)
+
+
+def crear_pedido(cliente, lineas, direccion, notas=''):
+    """
+    Crea un pedido PENDIENTE a partir de `lineas` ({bicicleta_id: cantidad})
+    en una sola transacción:
+
+    - bloquea las bicicletas y lee en una consulta su stock disponible (sin
+      lo reservado por otros clientes) y su precio efectivo;
+    - inserta todos los detalles con un solo bulk_create y calcula el total
+      en la misma pasada;
+    - pasa al pedido las reservas del carrito del cliente.
+
+    El stock no se descuenta aquí sino al despachar. Lanza StockInsuficiente
+    sin dejar nada creado si alguna línea no alcanza.
+    """
+    with transaction.atomic():
+        bicicletas = (
+            reservas.con_stock_disponible(
+                con_precio_efectivo(Bicicleta.objects.filter(pk__in=lineas.keys())),
+                cliente,
+            )
+            .select_for_update(of=('self',))
+            .in_bulk()
+        )
+
+        detalles = []
+        total = Decimal('0')
+        for bicicleta_id, cantidad in lineas.items():
+            bicicleta = bicicletas.get(bicicleta_id)
+            if bicicleta is None:
+                continue
+            if cantidad > bicicleta.stock_disponible:
+                raise StockInsuficiente(bicicleta, bicicleta.stock_disponible)
+            precio = precio_efectivo(bicicleta)
+            detalles.append(DetallePedido(bicicleta=bicicleta, cantidad=cantidad, precio_unitario=precio))
+            total += precio * cantidad
+
+        pedido = Pedido.objects.create(
+            cliente=cliente,
+            direccion_envio=direccion,
+            notas=notas,
+            estado=Pedido.Estado.PENDIENTE,
+            total=total,
+        )
+        contadores.registrar_creacion(pedido)
+        for detalle in detalles:
+            detalle.pedido = pedido
+        DetallePedido.objects.bulk_create(detalles, batch_size=500)
+
+        reservas.convertir(cliente, pedido, {
+            detalle.bicicleta_id: detalle.cantidad for detalle in detalles
+        })
+    return pedido
+
+
+def tomar(pedido, vendedor):
+    """
+    Asigna `vendedor` a un pedido PENDIENTE sin vendedor. El UPDATE es
+    condicional, así que si dos vendedores lo toman a la vez solo uno gana;
+    retorna False para el otro.
+    """
+    with transaction.atomic():
+        asignados = Pedido.objects.filter(
+            pk=pedido.pk, estado=Pedido.Estado.PENDIENTE, vendedor__isnull=True,
+        ).update(vendedor=vendedor, fecha_actualizacion=timezone.now())
+        if not asignados:
+            return False
+        pedido.refresh_from_db(fields=['estado', 'vendedor', 'total', 'fecha_actualizacion'])
+        contadores.registrar_asignacion(pedido, None)
+    return True
+
+
+def _demanda(pedidos):
+    """{bicicleta_id: unidades} sumando todos los pedidos, en una consulta agrupada."""
+    return dict(
+        DetallePedido.objects.filter(pedido__in=pedidos)
+        .order_by('bicicleta_id')
+        .values_list('bicicleta_id')
+        .annotate(total=Sum('cantidad'))
+    )
+
+
+def descontar_stock(pedido):
+    """Descuenta el stock de todas las líneas del pedido (ver descontar_stock_varios)."""
+    descontar_stock_varios([pedido])
+
+
+def descontar_stock_varios(pedidos):
+    """
+    Descuenta el stock de todas las líneas de los pedidos, con un UPDATE
+    por bicicleta sobre la demanda total. Cada UPDATE es condicional
+    (`stock >= cantidad`), así que dos despachos simultáneos nunca dejan
+    stock negativo. Si alguna no alcanza se revierte todo y se lanza
+    StockInsuficiente.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        for bicicleta_id, cantidad in _demanda(pedidos).items():
+            actualizadas = Bicicleta.objects.filter(pk=bicicleta_id, stock__gte=cantidad).update(
+                stock=F('stock') - cantidad,
+                fecha_actualizacion=ahora,
+            )
+            if not actualizadas:
+                bicicleta = Bicicleta.objects.get(pk=bicicleta_id)
+                raise StockInsuficiente(bicicleta, bicicleta.stock, cantidad)
+        # update() no dispara señales: invalidar el catálogo a mano
+        transaction.on_commit(cache_catalogo.incrementar_version)
+
+
+def restaurar_stock(pedido):
+    """Devuelve al stock las unidades del pedido (ver restaurar_stock_varios)."""
+    restaurar_stock_varios([pedido])
+
+
+def restaurar_stock_varios(pedidos):
+    """
+    Devuelve al stock las unidades de todos los pedidos, con un UPDATE por
+    bicicleta sobre la demanda total, en una transacción.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        for bicicleta_id, cantidad in _demanda(pedidos).items():
+            Bicicleta.objects.filter(pk=bicicleta_id).update(
+                stock=F('stock') + cantidad,
+                fecha_actualizacion=ahora,
+            )
+        transaction.on_commit(cache_catalogo.incrementar_version)
+
+
+def despachar(pedido, usuario):
+    """
+    Descuenta el stock y marca el pedido como DESPACHADO en una sola
+    transacción (el descuento es un efecto de la transición). Retorna False
+    si el pedido ya no estaba CONFIRMADO (por ejemplo, otro bodeguero lo
+    despachó antes).
+    """
+    try:
+        estados.transicionar(pedido, Pedido.Estado.DESPACHADO, usuario)
+    except estados.TransicionInvalida:
+        return False
+    return True
@@ -0,0 +1,18 @@
+import uuid
+
+from django import template
+from django.utils.html import format_html
+
+from pedidos.idempotencia import CAMPO
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def clave_idempotencia():
+    """
+    Campo oculto con una clave nueva en cada render del formulario: los
+    reenvíos del mismo formulario comparten la clave y no se ejecutan dos veces.
+    """
+    return format_html('<input type="hidden" name="{}" value="{}">', CAMPO, uuid.uuid4().hex)
@@ -1,3 +1,603 @@
-from django.test import TestCase
+import re
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from administracion import promociones
+from administracion.models import DescuentoVigente, Promocion
+from productos.models import Bicicleta
+from . import consultas, contadores, estados, metricas, reservas, servicios
+from .carrito.almacenamiento import AlmacenamientoCookie
+from .models import (
+    ContadorDiario, ContadorPedidos, DetallePedido, HistorialEstadoPedido, Pedido, ReservaStock,
+    RespuestaIdempotente,
+)
+
+
+def _bicicleta(modelo='Marlin', guardar=True, **campos):
+    """Bicicleta de prueba; `campos` reemplaza los valores por defecto."""
+    bicicleta = Bicicleta(**{
+        'marca': 'Trek', 'modelo': modelo, 'gama': 'media', 'tipo': 'mtb', 'medida_marco': 'm',
+        'precio': 1000, 'costo': 600, 'stock': 5, **campos,
+    })
+    if guardar:
+        bicicleta.save()
+    return bicicleta
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes de consulta se verifican con SQLite')
+class IndicesPedidosTests(TestCase):
+    """Las consultas frecuentes sobre pedidos deben usar índices, no recorrer la tabla."""
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {indice}', plan)
+        self.assertIsNone(
+            re.search(r'SCAN pedidos_pedido\s*$', plan, re.MULTILINE),
+            f'Recorrido completo de la tabla:\n{plan}',
+        )
+
+    def test_pedidos_del_cliente_por_estado(self):
+        consulta = Pedido.objects.filter(cliente_id=1, estado=Pedido.Estado.ENTREGADO).order_by()
+        self.assertUsaIndice(consulta, 'pedido_cliente_estado_idx')
+
+    def test_pedidos_del_vendedor_por_estado(self):
+        consulta = Pedido.objects.filter(vendedor_id=1, estado=Pedido.Estado.CONFIRMADO).order_by()
+        self.assertUsaIndice(consulta, 'pedido_vendedor_estado_idx')
+
+    def test_pedidos_por_estado_ordenados(self):
+        consulta = Pedido.objects.filter(estado=Pedido.Estado.CONFIRMADO)
+        self.assertUsaIndice(consulta, 'pedido_estado_fecha_idx')
+
+    def test_despachados_en_el_dia(self):
+        inicio = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        consulta = Pedido.objects.filter(
+            estado=Pedido.Estado.DESPACHADO,
+            fecha_actualizacion__gte=inicio,
+            fecha_actualizacion__lt=inicio + timedelta(days=1),
+        ).order_by()
+        self.assertUsaIndice(consulta, 'pedido_estado_actualiz_idx')
+
+    def test_pendientes_sin_vendedor(self):
+        consulta = Pedido.objects.filter(estado=Pedido.Estado.PENDIENTE, vendedor__isnull=True)
+        self.assertUsaIndice(consulta, 'pedido_sin_asignar_idx')
+
+
+class DescuentoStockConcurrenteTests(TransactionTestCase):
+    """Muchos despachos simultáneos de la misma bicicleta no deben sobrevender."""
+
+    STOCK = 10
+    PEDIDOS = 30
+    HILOS = 8
+
+    def setUp(self):
+        cliente = get_user_model().objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.bicicleta = _bicicleta(stock=self.STOCK)
+        self.pedidos = []
+        for _ in range(self.PEDIDOS):
+            pedido = Pedido.objects.create(
+                cliente=cliente, direccion_envio='Calle 1', estado=Pedido.Estado.CONFIRMADO, total=1000,
+            )
+            DetallePedido.objects.create(
+                pedido=pedido, bicicleta=self.bicicleta, cantidad=1, precio_unitario=1000,
+            )
+            self.pedidos.append(pedido)
+
+    def _despachar_todos(self):
+        pendientes = list(self.pedidos)
+        candado = threading.Lock()
+        barrera = threading.Barrier(self.HILOS)
+        resultados = {'descontados': 0, 'rechazados': 0}
+
+        def trabajar():
+            barrera.wait()
+            try:
+                while True:
+                    with candado:
+                        if not pendientes:
+                            return
+                        pedido = pendientes.pop()
+                    while True:
+                        try:
+                            servicios.descontar_stock(pedido)
+                            resultado = 'descontados'
+                        except servicios.StockInsuficiente:
+                            resultado = 'rechazados'
+                        except OperationalError:
+                            # SQLite bloquea la base completa: reintentar
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with candado:
+                        resultados[resultado] += 1
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    def test_no_sobrevende(self):
+        resultados = self._despachar_todos()
+
+        self.bicicleta.refresh_from_db()
+        self.assertEqual(resultados['descontados'], self.STOCK)
+        self.assertEqual(resultados['rechazados'], self.PEDIDOS - self.STOCK)
+        self.assertEqual(self.bicicleta.stock, 0)
+
+    def test_faltante_revierte_todas_las_lineas(self):
+        otra = _bicicleta('Talon', marca='Giant', precio=900, costo=500, stock=1)
+        pedido = self.pedidos[0]
+        DetallePedido.objects.create(pedido=pedido, bicicleta=otra, cantidad=2, precio_unitario=900)
+
+        with self.assertRaises(servicios.StockInsuficiente):
+            servicios.descontar_stock(pedido)
+
+        self.bicicleta.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual(self.bicicleta.stock, self.STOCK)
+        self.assertEqual(otra.stock, 1)
+
+
+class ConsultasPedidosTests(TestCase):
+    """Las páginas de pedidos hacen un número fijo de consultas, sin importar las filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Usuario = get_user_model()
+        cls.admin = Usuario.objects.create_user('admin', password='x', rol='admin')
+        cls.bodeguero = Usuario.objects.create_user('bodega', password='x', rol='bodeguero')
+        cls.vendedor = vendedor = Usuario.objects.create_user('vendedor', password='x', rol='vendedor')
+        bicicletas = [
+            _bicicleta(f'Marlin {i}')
+            for i in range(3)
+        ]
+        for i in range(30):
+            cliente = Usuario.objects.create_user(f'cliente{i}', password='x', direccion='Calle 1')
+            pedido = Pedido.objects.create(
+                cliente=cliente, vendedor=vendedor, direccion_envio='Calle 1',
+                estado=Pedido.Estado.PENDIENTE, total=3000,
+            )
+            for bicicleta in bicicletas:
+                DetallePedido.objects.create(
+                    pedido=pedido, bicicleta=bicicleta, cantidad=1, precio_unitario=1000,
+                )
+            pedido.cambiar_estado(Pedido.Estado.CONFIRMADO, vendedor)
+        cls.pedido = pedido
+
+    def _consultas(self, usuario, url):
+        self.client.force_login(usuario)
+        # Calentar la sesión y las cachés para contar solo las consultas de la vista
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(capturadas)
+
+    def test_lista_pagina_con_consultas_constantes(self):
+        respuesta, primera = self._consultas(self.admin, reverse('pedidos:lista'))
+        self.assertEqual(len(respuesta.context['pedidos']), consultas.PEDIDOS_POR_PAGINA)
+        siguiente = respuesta.context['pagina_siguiente']
+        self.assertIsNotNone(siguiente)
+
+        respuesta, segunda = self._consultas(self.admin, reverse('pedidos:lista') + siguiente)
+        self.assertEqual(len(respuesta.context['pedidos']), 30 - consultas.PEDIDOS_POR_PAGINA)
+        # Sesión, usuario, métricas y la página (con cliente y vendedor en el JOIN)
+        self.assertEqual(primera, 4)
+        self.assertEqual(segunda, 4)
+
+    def test_cola_sin_asignar_se_pagina_aparte(self):
+        cliente = get_user_model().objects.get(username='cliente0')
+        sin_asignar = {
+            Pedido.objects.create(
+                cliente=cliente, direccion_envio='Calle 1', estado=Pedido.Estado.PENDIENTE, total=1000,
+            ).pk
+            for _ in range(consultas.PEDIDOS_POR_PAGINA + 5)
+        }
+        contadores.reconstruir()
+        self.client.force_login(self.vendedor)
+        respuesta = self.client.get(reverse('pedidos:lista'))
+        propios = [pedido.pk for pedido in respuesta.context['pedidos']]
+        # Avanzar primero en los pedidos propios: la cola debe conservar ese cursor
+        url = reverse('pedidos:lista') + respuesta.context['pagina_siguiente']
+        vistos = []
+        while url:
+            respuesta = self.client.get(url)
+            vistos += [pedido.pk for pedido in respuesta.context['pedidos_pendientes']]
+            self.assertNotIn(propios[0], [pedido.pk for pedido in respuesta.context['pedidos']])
+            siguiente = respuesta.context['pendientes_siguiente']
+            url = reverse('pedidos:lista') + siguiente if siguiente else None
+
+        self.assertEqual(len(vistos), len(sin_asignar))
+        self.assertEqual(set(vistos), sin_asignar)
+        self.assertEqual(respuesta.context['metricas']['sin_asignar'], len(sin_asignar))
+
+    def test_panel_bodega_no_consulta_por_fila(self):
+        _, total = self._consultas(self.bodeguero, reverse('bodega:panel'))
+        # Sesión, usuario, página, contadores de estado y del día, inventario,
+        # daños e ingresos
+        self.assertEqual(total, 8)
+
+    def test_detalle_precarga_lineas_e_historial(self):
+        respuesta, total = self._consultas(
+            self.admin, reverse('pedidos:detalle', args=[self.pedido.pk])
+        )
+        self.assertEqual(len(respuesta.context['historial']), 1)
+        # Sesión, usuario, pedido, líneas, bicicletas, historial y sus usuarios
+        self.assertEqual(total, 7)
+
+
+class MaquinaEstadosTests(TestCase):
+    """Las transiciones se validan en lote y se aplican con consultas fijas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Usuario = get_user_model()
+        cls.vendedor = Usuario.objects.create_user('vendedor', password='x', rol='vendedor')
+        cls.otro_vendedor = Usuario.objects.create_user('otro', password='x', rol='vendedor')
+        cliente = Usuario.objects.create_user('cliente', password='x', direccion='Calle 1')
+        cls.pedidos = [
+            Pedido.objects.create(
+                cliente=cliente, vendedor=cls.vendedor, direccion_envio='Calle 1',
+                estado=Pedido.Estado.PENDIENTE, total=1000,
+            )
+            for _ in range(20)
+        ]
+        cls.entregado = Pedido.objects.create(
+            cliente=cliente, vendedor=cls.vendedor, direccion_envio='Calle 1',
+            estado=Pedido.Estado.ENTREGADO, total=1000,
+        )
+        contadores.reconstruir()
+
+    def test_lote_con_consultas_constantes(self):
+        # El primer cambio crea las filas de contadores que faltan
+        estados.transicionar(self.pedidos[0], Pedido.Estado.CANCELADO, self.vendedor)
+
+        # Savepoint, bloqueo, UPDATE, contadores (salida, entrada y día),
+        # borrado de reservas, historial y release
+        with self.assertNumQueries(9):
+            resultado = estados.transicionar_varios(
+                self.pedidos[1:] + [self.entregado], Pedido.Estado.CANCELADO, self.vendedor,
+            )
+
+        self.assertEqual(len(resultado.aplicados), 19)
+        self.assertEqual(list(resultado.rechazados), [self.entregado.pk])
+        self.assertEqual(
+            Pedido.objects.filter(estado=Pedido.Estado.CANCELADO).count(), 20
+        )
+        self.assertEqual(
+            HistorialEstadoPedido.objects.filter(estado_nuevo=Pedido.Estado.CANCELADO).count(), 20
+        )
+
+    def test_cancelar_despachados_restaura_stock_por_bicicleta(self):
+        bicicletas = [
+            _bicicleta(modelo, stock=0)
+            for modelo in ('A', 'B')
+        ]
+        despachados = self.pedidos[:3]
+        for pedido in despachados:
+            for bicicleta, cantidad in zip(bicicletas, (2, 1)):
+                DetallePedido.objects.create(
+                    pedido=pedido, bicicleta=bicicleta, cantidad=cantidad, precio_unitario=1000,
+                )
+        Pedido.objects.filter(pk__in=[pedido.pk for pedido in despachados]).update(
+            estado=Pedido.Estado.DESPACHADO,
+        )
+
+        with CaptureQueriesContext(connection) as consultas_hechas:
+            estados.transicionar_varios(self.pedidos[:5], Pedido.Estado.CANCELADO, None)
+
+        actualizaciones = [
+            consulta for consulta in consultas_hechas.captured_queries
+            if consulta['sql'].startswith('UPDATE "productos_bicicleta"')
+        ]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertEqual(
+            sorted(Bicicleta.objects.filter(pk__in=[b.pk for b in bicicletas]).values_list('modelo', 'stock')),
+            [('A', 6), ('B', 3)],
+        )
+
+    def test_respeta_permisos_del_rol(self):
+        resultado = estados.transicionar_varios(
+            self.pedidos, Pedido.Estado.CONFIRMADO, self.otro_vendedor,
+        )
+        self.assertEqual(resultado.aplicados, [])
+        self.assertEqual(len(resultado.rechazados), 20)
+
+        with self.assertRaises(estados.TransicionInvalida):
+            self.pedidos[0].cambiar_estado(Pedido.Estado.ENTREGADO, self.vendedor)
+        self.pedidos[0].refresh_from_db()
+        self.assertEqual(self.pedidos[0].estado, Pedido.Estado.PENDIENTE)
+
+
+class ContadoresPedidosTests(TestCase):
+    """Los contadores mantenidos en cada operación coinciden con una reconstrucción completa."""
+
+    def setUp(self):
+        Usuario = get_user_model()
+        self.vendedor = Usuario.objects.create_user('vendedor', password='x', rol='vendedor')
+        self.bodeguero = Usuario.objects.create_user('bodega', password='x', rol='bodeguero')
+        self.cliente = Usuario.objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.bicicleta = _bicicleta(stock=10)
+
+    def _contadores(self):
+        return (
+            sorted(ContadorPedidos.objects.filter(cantidad__gt=0).values_list(
+                'estado', 'vendedor_id', 'cantidad', 'total',
+            )),
+            sorted(ContadorDiario.objects.values_list('fecha', 'estado', 'cantidad')),
+        )
+
+    def test_coinciden_con_la_reconstruccion(self):
+        pedidos = [
+            servicios.crear_pedido(self.cliente, {self.bicicleta.pk: 1}, 'Calle 1')
+            for _ in range(4)
+        ]
+        for pedido in pedidos[:3]:
+            self.assertTrue(servicios.tomar(pedido, self.vendedor))
+        self.assertFalse(servicios.tomar(pedidos[0], self.vendedor))
+        estados.transicionar_varios(pedidos[:3], Pedido.Estado.CONFIRMADO, self.vendedor)
+        servicios.despachar(pedidos[0], self.bodeguero)
+        pedidos[1].cambiar_estado(Pedido.Estado.CANCELADO, self.vendedor)
+
+        metricas_vendedor = metricas.metricas_vendedor(self.vendedor)
+        self.assertEqual(metricas_vendedor['sin_asignar'], 1)
+        self.assertEqual(metricas_vendedor['confirmados'], 1)
+        self.assertEqual(metricas_vendedor['despachados'], 1)
+        self.assertEqual(metricas.metricas_bodega(), {'para_despachar': 1, 'despachados_hoy': 1})
+        self.assertEqual(metricas.metricas_admin()['total_pedidos'], 4)
+
+        mantenidos = self._contadores()
+        contadores.reconstruir()
+        self.assertEqual(self._contadores(), mantenidos)
+
+
+class IdempotenciaCheckoutTests(TestCase):
+    """Los reintentos del checkout no crean pedidos de más ni dejan el carrito lleno."""
+
+    def setUp(self):
+        self.cliente = get_user_model().objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.bicicleta = _bicicleta(stock=10)
+        self.client.force_login(self.cliente)
+        self.client.post(reverse('pedidos:agregar_carrito', args=[self.bicicleta.pk]), {'cantidad': 1})
+
+    def _checkout(self, clave='clave-1'):
+        return self.client.post(
+            reverse('pedidos:checkout'),
+            {'direccion': 'Calle 1', 'clave_idempotencia': clave},
+        )
+
+    def test_reintento_reproduce_la_respuesta_y_borra_el_carrito(self):
+        carrito = self.client.cookies['carrito'].value
+        primera = self._checkout()
+        self.assertEqual(primera.status_code, 302)
+        self.assertEqual(primera.cookies['carrito'].value, '')
+
+        # La primera respuesta se perdió: el navegador aún tiene el carrito
+        self.client.cookies['carrito'] = carrito
+        segunda = self._checkout()
+
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda['Location'], primera['Location'])
+        self.assertEqual(segunda.cookies['carrito'].value, '')
+        self.assertEqual(segunda.cookies['carrito']['max-age'], 0)
+        self.assertEqual(Pedido.objects.count(), 1)
+
+    def test_en_curso_responde_409(self):
+        RespuestaIdempotente.objects.create(
+            usuario=self.cliente, clave='clave-1', ruta=reverse('pedidos:checkout'),
+            expira=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self._checkout().status_code, 409)
+        self.assertEqual(Pedido.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCIA_EN_CURSO_SEGUNDOS=60)
+    def test_en_curso_abandonada_se_vuelve_a_ejecutar(self):
+        RespuestaIdempotente.objects.create(
+            usuario=self.cliente, clave='clave-1', ruta=reverse('pedidos:checkout'),
+            fecha_creacion=timezone.now() - timedelta(minutes=5),
+            expira=timezone.now() + timedelta(hours=1),
+        )
+        response = self._checkout()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertIsNotNone(RespuestaIdempotente.objects.get(clave='clave-1').codigo)
+
+    def test_clave_usada_en_otra_ruta_responde_422(self):
+        RespuestaIdempotente.objects.create(
+            usuario=self.cliente, clave='clave-1', ruta='/otra/', codigo=302,
+            expira=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self._checkout().status_code, 422)
+        self.assertEqual(Pedido.objects.count(), 0)
+
+
+class ReservasCarritoTests(TestCase):
+    """Lo que un cliente tiene en el carrito no lo puede apartar otro."""
+
+    def setUp(self):
+        Usuario = get_user_model()
+        self.cliente = Usuario.objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.otro = Usuario.objects.create_user('otro', password='x', direccion='Calle 2')
+        self.bicicleta = _bicicleta(stock=3)
+
+    def _agregar(self, usuario, cantidad):
+        self.client.force_login(usuario)
+        return self.client.post(
+            reverse('pedidos:api_agregar_carrito', args=[self.bicicleta.pk]), {'cantidad': cantidad},
+        )
+
+    def _disponible(self, usuario=None):
+        return reservas.disponibles([self.bicicleta.pk], usuario)[self.bicicleta.pk]
+
+    def test_reserva_aparta_unidades_para_los_demas(self):
+        self.assertTrue(self._agregar(self.cliente, 2).json()['exito'])
+        self.assertEqual(self._disponible(self.otro), 1)
+        self.assertEqual(self._disponible(self.cliente), 3)
+        self.assertFalse(self._agregar(self.otro, 2).json()['exito'])
+        self.assertTrue(self._agregar(self.otro, 1).json()['exito'])
+
+    def test_cantidad_menor_a_uno_se_rechaza(self):
+        self.client.force_login(self.cliente)
+        response = self.client.post(
+            reverse('pedidos:agregar_carrito', args=[self.bicicleta.pk]),
+            {'cantidad': -1, 'next': '/'},
+        )
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(
+            reverse('pedidos:agregar_carrito', args=[self.bicicleta.pk]),
+            {'cantidad': 'dos', 'next': '/'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ReservaStock.objects.exists())
+        self.assertFalse(self._agregar(self.cliente, 0).json()['exito'])
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_reserva_vencida_no_aparta_y_el_comando_la_borra(self):
+        self._agregar(self.cliente, 3)
+        ReservaStock.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self._disponible(self.otro), 3)
+
+        call_command('liberar_reservas', stdout=StringIO())
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_liberar_no_toca_las_reservas_de_pedidos(self):
+        self._agregar(self.cliente, 1)
+        pedido = servicios.crear_pedido(self.cliente, {self.bicicleta.pk: 1}, 'Calle 1')
+        ReservaStock.objects.filter(pedido=pedido).update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(reservas.liberar_vencidas(), 0)
+        self.assertEqual(self._disponible(self.otro), 2)
+
+    def test_checkout_convierte_las_reservas_en_del_pedido(self):
+        self._agregar(self.cliente, 2)
+        pedido = servicios.crear_pedido(self.cliente, {self.bicicleta.pk: 2}, 'Calle 1')
+
+        reserva = ReservaStock.objects.get()
+        self.assertEqual((reserva.pedido_id, reserva.cantidad), (pedido.pk, 2))
+        self.assertIsNone(reserva.expira)
+        # Ya no es del carrito: el mismo cliente tampoco puede usar esas unidades
+        self.assertEqual(self._disponible(self.cliente), 1)
+
+        estados.transicionar(pedido, Pedido.Estado.CANCELADO, None)
+        self.assertFalse(ReservaStock.objects.exists())
+        self.assertEqual(self._disponible(self.otro), 3)
+
+
+class CarritoCookieTests(TestCase):
+    """La cookie del carrito solo se acepta intacta y para el usuario que la creó."""
+
+    def setUp(self):
+        Usuario = get_user_model()
+        self.cliente = Usuario.objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.otro = Usuario.objects.create_user('otro', password='x', direccion='Calle 2')
+
+    def _almacenamiento(self, usuario, token=None):
+        request = RequestFactory().get('/')
+        request.user = usuario
+        if token is not None:
+            request.COOKIES[AlmacenamientoCookie.NOMBRE_COOKIE] = token
+        return AlmacenamientoCookie(request)
+
+    def _token(self, usuario, carrito):
+        almacenamiento = self._almacenamiento(usuario)
+        almacenamiento.guardar(carrito)
+        return almacenamiento.request._carrito_cookie
+
+    def test_ida_y_vuelta(self):
+        token = self._token(self.cliente, {'7': {'cantidad': 2, 'precio': '1000.00'}})
+        self.assertEqual(self._almacenamiento(self.cliente, token).cargar(), {'7': {'cantidad': 2}})
+
+    def test_token_adulterado_se_ignora(self):
+        token = self._token(self.cliente, {'7': {'cantidad': 2}})
+        datos, firma = token.rsplit(':', 1)
+        adulterado = f"{datos}:{'A' if firma[0] != 'A' else 'B'}{firma[1:]}"
+        self.assertEqual(self._almacenamiento(self.cliente, adulterado).cargar(), {})
+        # Firmado con otra sal (por ejemplo, la de la sesión) tampoco sirve
+        ajeno = signing.dumps({'u': self.cliente.pk, 'c': {'7': 99}}, compress=True)
+        self.assertEqual(self._almacenamiento(self.cliente, ajeno).cargar(), {})
+
+    def test_cookie_de_otro_usuario_se_ignora(self):
+        token = self._token(self.cliente, {'7': {'cantidad': 2}})
+        self.assertEqual(self._almacenamiento(self.otro, token).cargar(), {})
+
+    def test_carrito_vacio_borra_la_cookie(self):
+        self.client.force_login(self.cliente)
+        self.client.cookies[AlmacenamientoCookie.NOMBRE_COOKIE] = self._token(self.cliente, {'7': {'cantidad': 1}})
+        response = self.client.post(reverse('pedidos:eliminar_carrito', args=[7]))
+        self.assertEqual(response.cookies[AlmacenamientoCookie.NOMBRE_COOKIE].value, '')
+
+    def test_limite_de_lineas(self):
+        maximo = AlmacenamientoCookie.maximo_lineas
+        Bicicleta.objects.bulk_create([
+            _bicicleta(f'M{i}', stock=1, guardar=False)
+            for i in range(maximo + 1)
+        ])
+        ids = list(Bicicleta.objects.order_by('pk').values_list('pk', flat=True))
+        self.client.force_login(self.cliente)
+        response = self.client.post(
+            reverse('pedidos:api_agregar_lote_carrito'),
+            data={'lineas': [{'bicicleta': pk, 'cantidad': 1} for pk in ids[:maximo]]},
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['exito'])
+
+        response = self.client.post(reverse('pedidos:api_agregar_carrito', args=[ids[-1]]))
+        self.assertFalse(response.json()['exito'])
+        self.assertIn(f'hasta {maximo} productos', response.json()['mensaje'])
+
+
+class ApiCarritoTests(TestCase):
+    """La API del carrito responde en JSON también cuando no hay sesión."""
+
+    def test_sin_sesion_responde_401(self):
+        urls = [
+            reverse('pedidos:api_agregar_carrito', args=[1]),
+            reverse('pedidos:api_actualizar_carrito', args=[1]),
+            reverse('pedidos:api_eliminar_carrito', args=[1]),
+            reverse('pedidos:api_agregar_lote_carrito'),
+        ]
+        for url in urls:
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 401, url)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertFalse(response.json()['exito'])
+
+
+class PreciosEnCheckoutTests(TestCase):
+    """El checkout no recalcula los descuentos mientras tiene las bicicletas bloqueadas."""
+
+    def setUp(self):
+        self.cliente = get_user_model().objects.create_user('cliente', password='x', direccion='Calle 1')
+        self.bicicleta = _bicicleta()
+        hoy = timezone.localdate()
+        self.promocion = Promocion.objects.create(
+            nombre='Mitad', descripcion='', descuento=50, fecha_inicio=hoy, fecha_fin=hoy,
+        )
+        self.promocion.bicicletas.add(self.bicicleta)
+        promociones.materializar(forzar=True)
+
+    def test_usa_la_ultima_tabla_y_recalcula_al_confirmar(self):
+        with self.captureOnCommitCallbacks() as pendientes:
+            self.promocion.descuento = 80
+            self.promocion.save()
+            pedido = servicios.crear_pedido(self.cliente, {self.bicicleta.pk: 1}, 'Calle 1')
+            self.assertEqual(pedido.total, 500)
+            self.assertEqual(DescuentoVigente.objects.get().descuento, 50)
+
+        for callback in pendientes:
+            callback()
+        self.assertEqual(DescuentoVigente.objects.get().descuento, 80)
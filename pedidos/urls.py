@@ -23,6 +23,12 @@ urlpatterns = [
     path('carrito/eliminar/<int:bicicleta_id>/', views.eliminar_del_carrito, name='eliminar_carrito'),
     path('carrito/actualizar/<int:bicicleta_id>/', views.actualizar_carrito, name='actualizar_carrito'),
     
+    # API del carrito (JSON)
+    path('carrito/api/agregar/<int:bicicleta_id>/', views.api_agregar_carrito, name='api_agregar_carrito'),
+    path('carrito/api/agregar-lote/', views.api_agregar_lote_carrito, name='api_agregar_lote_carrito'),
+    path('carrito/api/eliminar/<int:bicicleta_id>/', views.api_eliminar_carrito, name='api_eliminar_carrito'),
+    path('carrito/api/actualizar/<int:bicicleta_id>/', views.api_actualizar_carrito, name='api_actualizar_carrito'),
+    
     # Checkout
     path('checkout/', views.checkout, name='checkout'),
 ]
@@ -1,12 +1,20 @@
+import json
+from functools import wraps
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST
-from django.db.models import Q, Count, Sum
-from .models import Pedido, DetallePedido, HistorialEstadoPedido
-from .carrito import Carrito
+from django.db import transaction
+from django.db.models import Q, Count
+from .models import Pedido, HistorialEstadoPedido
+from .carrito import obtener_carrito
+from . import consultas, estados, metricas, servicios
+from .idempotencia import idempotente
 from productos.models import Bicicleta
+from productos.precios import con_precio_efectivo
 
 
 @login_required
@@ -19,19 +27,7 @@ def lista_pedidos(request):
         # Cliente: solo sus pedidos con resumen por estado
         pedidos = Pedido.objects.filter(cliente=user)
         
-        # Métricas del cliente
-        context['metricas'] = {
-            'pendientes': pedidos.filter(estado=Pedido.Estado.PENDIENTE).count(),
-            'en_proceso': pedidos.filter(estado__in=[
-                Pedido.Estado.CONFIRMADO, 
-                Pedido.Estado.DESPACHADO, 
-                Pedido.Estado.EN_CAMINO
-            ]).count(),
-            'entregados': pedidos.filter(estado=Pedido.Estado.ENTREGADO).count(),
-            'total_compras': pedidos.filter(estado=Pedido.Estado.ENTREGADO).aggregate(
-                total=Sum('total')
-            )['total'] or 0,
-        }
+        context['metricas'] = metricas.metricas_cliente(user)
         
     elif user.es_vendedor:
         # Vendedor: pedidos pendientes sin asignar + sus pedidos asignados
@@ -42,50 +38,33 @@ def lista_pedidos(request):
         pedidos = Pedido.objects.filter(vendedor=user).exclude(
             estado__in=[Pedido.Estado.ENTREGADO, Pedido.Estado.CANCELADO]
         )
-        context['pedidos_pendientes'] = pedidos_pendientes
+        # La cola sin asignar se pagina con su propio cursor
+        pendientes, anterior, siguiente = consultas.paginar_pedidos(
+            request, pedidos_pendientes, parametro='cursor_pendientes',
+        )
+        context['pedidos_pendientes'] = pendientes
+        context['pendientes_anterior'] = anterior
+        context['pendientes_siguiente'] = siguiente
         
-        # Métricas del vendedor
-        mis_pedidos = Pedido.objects.filter(vendedor=user)
-        context['metricas'] = {
-            'sin_asignar': pedidos_pendientes.count(),
-            'pendientes': mis_pedidos.filter(estado=Pedido.Estado.PENDIENTE).count(),
-            'confirmados': mis_pedidos.filter(estado=Pedido.Estado.CONFIRMADO).count(),
-            'despachados': mis_pedidos.filter(estado=Pedido.Estado.DESPACHADO).count(),
-            'en_camino': mis_pedidos.filter(estado=Pedido.Estado.EN_CAMINO).count(),
-            'entregados_total': mis_pedidos.filter(estado=Pedido.Estado.ENTREGADO).count(),
-        }
+        context['metricas'] = metricas.metricas_vendedor(user)
         
     elif user.es_bodeguero:
         # Bodeguero: solo pedidos CONFIRMADOS (listos para despachar)
         pedidos = Pedido.objects.filter(estado=Pedido.Estado.CONFIRMADO)
-        
-        # Métricas del bodeguero
         context['metricas'] = {
-            'para_despachar': pedidos.count(),
-            'despachados_hoy': Pedido.objects.filter(
-                estado=Pedido.Estado.DESPACHADO,
-                fecha_actualizacion__date=__import__('django.utils.timezone', fromlist=['now']).now().date()
-            ).count(),
-            'bajo_stock': Bicicleta.objects.filter(stock__lt=3, activo=True).count(),
+            **metricas.metricas_bodega(),
+            'bajo_stock': metricas.metricas_inventario()['bajo_stock'],
         }
         
     else:  # Admin
         pedidos = Pedido.objects.all()
         
-        # Métricas globales del admin
-        context['metricas'] = {
-            'total_pedidos': pedidos.count(),
-            'pendientes': pedidos.filter(estado=Pedido.Estado.PENDIENTE).count(),
-            'confirmados': pedidos.filter(estado=Pedido.Estado.CONFIRMADO).count(),
-            'despachados': pedidos.filter(estado=Pedido.Estado.DESPACHADO).count(),
-            'en_camino': pedidos.filter(estado=Pedido.Estado.EN_CAMINO).count(),
-            'entregados': pedidos.filter(estado=Pedido.Estado.ENTREGADO).count(),
-            'ingresos_totales': pedidos.filter(estado=Pedido.Estado.ENTREGADO).aggregate(
-                total=Sum('total')
-            )['total'] or 0,
-        }
+        context['metricas'] = metricas.metricas_admin()
     
-    context['pedidos'] = pedidos
+    pagina, anterior, siguiente = consultas.paginar_pedidos(request, pedidos)
+    context['pedidos'] = pagina
+    context['pagina_anterior'] = anterior
+    context['pagina_siguiente'] = siguiente
     return render(request, 'pedidos/lista.html', context)
 
 
@@ -98,7 +77,7 @@ def crear_pedido(request):
 @login_required
 def detalle_pedido(request, pk):
     """Ver detalle de un pedido con su historial."""
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(consultas.con_detalle(Pedido.objects.all()), pk=pk)
     user = request.user
     
     # Clientes solo pueden ver sus propios pedidos
@@ -122,27 +101,21 @@ def cambiar_estado(request, pk):
     if request.method == 'POST':
         nuevo_estado = request.POST.get('estado')
         
-        # Validar permisos de cambio de estado
-        puede_cambiar = False
-        
-        if user.es_vendedor and pedido.vendedor == user:
-            # Vendedor asignado puede: CONFIRMADO -> EN_CAMINO -> ENTREGADO
-            if nuevo_estado in [Pedido.Estado.CONFIRMADO, Pedido.Estado.EN_CAMINO, Pedido.Estado.ENTREGADO]:
-                puede_cambiar = True
-        elif user.es_bodeguero and nuevo_estado == Pedido.Estado.DESPACHADO:
-            puede_cambiar = True
-        elif user.es_admin:
-            puede_cambiar = True
-        
-        if puede_cambiar:
+        # Las reglas de cada rol están en pedidos.estados
+        try:
             pedido.cambiar_estado(nuevo_estado, user)
             messages.success(request, f'Estado cambiado a {pedido.get_estado_display()}')
-        else:
-            messages.error(request, 'No tienes permiso para realizar este cambio.')
+        except estados.TransicionInvalida as error:
+            messages.error(request, str(error))
+        except servicios.StockInsuficiente as error:
+            messages.error(request, str(error))
         
         return redirect('pedidos:detalle', pk=pk)
     
-    return render(request, 'pedidos/cambiar_estado.html', {'pedido': pedido})
+    return render(request, 'pedidos/cambiar_estado.html', {
+        'pedido': pedido,
+        'siguientes': estados.siguientes(pedido, user),
+    })
 
 
 # ============================================================
@@ -165,42 +138,36 @@ def tomar_pedido(request, pk):
         messages.error(request, 'Este pedido ya no está pendiente.')
         return redirect('pedidos:lista')
     
-    if pedido.vendedor is not None:
+    # Asignar vendedor (falla si otro vendedor lo tomó primero)
+    if pedido.vendedor is not None or not servicios.tomar(pedido, user):
         messages.error(request, 'Este pedido ya fue tomado por otro vendedor.')
         return redirect('pedidos:lista')
     
-    # Asignar vendedor
-    pedido.vendedor = user
-    pedido.save(update_fields=['vendedor'])
-    
     messages.success(request, f'Has tomado el pedido #{pedido.pk}. Ahora puedes confirmarlo.')
     return redirect('pedidos:detalle', pk=pk)
 
 
 @login_required
 @require_POST
+@idempotente
 def confirmar_pedido_vendedor(request, pk):
     """Vendedor confirma el pedido para que pase a bodega."""
     pedido = get_object_or_404(Pedido, pk=pk)
     user = request.user
     
-    # Verificar permisos
-    if not (user.es_admin or (user.es_vendedor and pedido.vendedor == user)):
-        messages.error(request, 'No tienes permiso para confirmar este pedido.')
-        return redirect('pedidos:detalle', pk=pk)
-    
-    if pedido.estado != Pedido.Estado.PENDIENTE:
-        messages.error(request, 'Solo se pueden confirmar pedidos pendientes.')
+    # Cambiar estado a CONFIRMADO (solo el vendedor asignado o el admin)
+    try:
+        pedido.cambiar_estado(Pedido.Estado.CONFIRMADO, user)
+    except estados.TransicionInvalida as error:
+        messages.error(request, str(error))
         return redirect('pedidos:detalle', pk=pk)
-    
-    # Cambiar estado a CONFIRMADO
-    pedido.cambiar_estado(Pedido.Estado.CONFIRMADO, user)
     messages.success(request, f'Pedido #{pedido.pk} confirmado. Ahora está listo para bodega.')
     return redirect('pedidos:detalle', pk=pk)
 
 
 @login_required
 @require_POST
+@idempotente
 def despachar_pedido(request, pk):
     """Bodeguero despacha el pedido y descuenta stock."""
     pedido = get_object_or_404(Pedido, pk=pk)
@@ -215,23 +182,16 @@ def despachar_pedido(request, pk):
         messages.error(request, 'Solo se pueden despachar pedidos confirmados.')
         return redirect('pedidos:detalle', pk=pk)
     
-    # Verificar y descontar stock
-    for detalle in pedido.detalles.all():
-        if detalle.cantidad > detalle.bicicleta.stock:
-            messages.error(
-                request,
-                f'Stock insuficiente para {detalle.bicicleta.marca} {detalle.bicicleta.modelo}. '
-                f'Disponible: {detalle.bicicleta.stock}, Requerido: {detalle.cantidad}'
-            )
-            return redirect('pedidos:detalle', pk=pk)
-    
-    # Descontar stock
-    for detalle in pedido.detalles.all():
-        detalle.bicicleta.stock -= detalle.cantidad
-        detalle.bicicleta.save()
+    # Descontar stock y cambiar estado a DESPACHADO
+    try:
+        despachado = servicios.despachar(pedido, user)
+    except servicios.StockInsuficiente as error:
+        messages.error(request, str(error))
+        return redirect('pedidos:detalle', pk=pk)
+    if not despachado:
+        messages.error(request, 'Solo se pueden despachar pedidos confirmados.')
+        return redirect('pedidos:detalle', pk=pk)
     
-    # Cambiar estado a DESPACHADO
-    pedido.cambiar_estado(Pedido.Estado.DESPACHADO, user)
     messages.success(request, f'Pedido #{pedido.pk} despachado. Stock descontado.')
     return redirect('pedidos:detalle', pk=pk)
 
@@ -247,22 +207,9 @@ def cancelar_pedido(request, pk):
         messages.error(request, 'Este pedido no puede ser cancelado.')
         return redirect('pedidos:detalle', pk=pk)
     
-    # Verificar permisos según rol
-    puede_cancelar = False
-    requiere_motivo = True
-    
-    if user.es_admin:
-        # Admin puede cancelar cualquier pedido (excepto entregado)
-        puede_cancelar = True
-    elif user.es_vendedor and (pedido.vendedor == user or pedido.vendedor is None):
-        # Vendedor puede cancelar PENDIENTE o CONFIRMADO
-        if pedido.estado in [Pedido.Estado.PENDIENTE, Pedido.Estado.CONFIRMADO]:
-            puede_cancelar = True
-    elif user.es_cliente and pedido.cliente == user:
-        # Cliente solo puede cancelar PENDIENTE
-        if pedido.estado == Pedido.Estado.PENDIENTE:
-            puede_cancelar = True
-            requiere_motivo = False
+    # Verificar permisos según rol; el cliente no necesita indicar motivo
+    puede_cancelar = estados.puede(user, pedido, Pedido.Estado.CANCELADO)
+    requiere_motivo = not user.es_cliente
     
     if not puede_cancelar:
         messages.error(request, 'No tienes permiso para cancelar este pedido.')
@@ -278,21 +225,23 @@ def cancelar_pedido(request, pk):
                 'requiere_motivo': requiere_motivo
             })
         
-        # Si el pedido ya fue despachado, restaurar stock
-        if pedido.estado == Pedido.Estado.DESPACHADO:
-            for detalle in pedido.detalles.all():
-                detalle.bicicleta.stock += detalle.cantidad
-                detalle.bicicleta.save()
-            messages.info(request, 'Stock restaurado.')
-        
-        # Cambiar estado a CANCELADO
         notas_cancelacion = f"Cancelado por {user.username}"
         if motivo:
             notas_cancelacion += f". Motivo: {motivo}"
         
-        pedido.notas = notas_cancelacion if not pedido.notas else f"{pedido.notas}\n{notas_cancelacion}"
-        pedido.save(update_fields=['notas'])
-        pedido.cambiar_estado(Pedido.Estado.CANCELADO, user)
+        # Si el pedido ya fue despachado, la transición restaura el stock
+        restaurado = pedido.estado == Pedido.Estado.DESPACHADO
+        try:
+            with transaction.atomic():
+                pedido.notas = notas_cancelacion if not pedido.notas else f"{pedido.notas}\n{notas_cancelacion}"
+                pedido.save(update_fields=['notas'])
+                pedido.cambiar_estado(Pedido.Estado.CANCELADO, user)
+        except estados.TransicionInvalida as error:
+            messages.error(request, str(error))
+            return redirect('pedidos:detalle', pk=pk)
+        
+        if restaurado:
+            messages.info(request, 'Stock restaurado.')
         
         messages.success(request, f'Pedido #{pedido.pk} cancelado exitosamente.')
         return redirect('pedidos:lista')
@@ -308,7 +257,7 @@ def descargar_factura(request, pk):
     """Ver o descargar factura PDF del pedido."""
     from .factura import descargar_factura_response
     
-    pedido = get_object_or_404(Pedido, pk=pk)
+    pedido = get_object_or_404(consultas.con_detalle(Pedido.objects.all()), pk=pk)
     user = request.user
     
     # Verificar permisos
@@ -347,10 +296,10 @@ def descargar_factura(request, pk):
 @login_required
 def ver_carrito(request):
     """Muestra el carrito de compras."""
-    carrito = Carrito(request)
+    resumen = obtener_carrito(request).resumen()
     return render(request, 'pedidos/carrito.html', {
-        'carrito_items': carrito.get_items(),
-        'carrito_total': carrito.get_total()
+        'carrito_items': resumen,
+        'carrito_total': resumen.total
     })
 
 
@@ -358,11 +307,14 @@ def ver_carrito(request):
 @require_POST
 def agregar_al_carrito(request, bicicleta_id):
     """Agrega una bicicleta al carrito."""
-    bicicleta = get_object_or_404(Bicicleta, id=bicicleta_id)
-    carrito = Carrito(request)
+    bicicleta = get_object_or_404(con_precio_efectivo(Bicicleta.objects.all()), id=bicicleta_id)
+    carrito = obtener_carrito(request)
     
-    cantidad = int(request.POST.get('cantidad', 1))
-    exito, mensaje = carrito.agregar(bicicleta, cantidad)
+    cantidad = _leer_cantidad(request)
+    if cantidad is None or cantidad < 1:
+        exito, mensaje = False, 'Cantidad inválida.'
+    else:
+        exito, mensaje = carrito.agregar(bicicleta, cantidad)
     
     if exito:
         messages.success(request, mensaje)
@@ -378,7 +330,7 @@ def agregar_al_carrito(request, bicicleta_id):
 @require_POST
 def eliminar_del_carrito(request, bicicleta_id):
     """Elimina una bicicleta del carrito."""
-    carrito = Carrito(request)
+    carrito = obtener_carrito(request)
     carrito.eliminar(bicicleta_id)
     messages.success(request, 'Producto eliminado del carrito.')
     return redirect('pedidos:carrito')
@@ -388,10 +340,13 @@ def eliminar_del_carrito(request, bicicleta_id):
 @require_POST
 def actualizar_carrito(request, bicicleta_id):
     """Actualiza la cantidad de una bicicleta en el carrito."""
-    carrito = Carrito(request)
-    cantidad = int(request.POST.get('cantidad', 1))
+    carrito = obtener_carrito(request)
+    cantidad = _leer_cantidad(request)
     
-    exito, mensaje = carrito.actualizar_cantidad(bicicleta_id, cantidad)
+    if cantidad is None:
+        exito, mensaje = False, 'Cantidad inválida.'
+    else:
+        exito, mensaje = carrito.actualizar_cantidad(bicicleta_id, cantidad)
     
     if exito:
         messages.success(request, mensaje)
@@ -401,10 +356,167 @@ def actualizar_carrito(request, bicicleta_id):
     return redirect('pedidos:carrito')
 
 
+# ============================================================
+# API DEL CARRITO (JSON)
+# ============================================================
+
+# Líneas que acepta una sola petición de agregado en lote
+MAXIMO_LINEAS_LOTE = 100
+
+
+def api_login_required(view_func):
+    """
+    Como login_required, pero para la API: sin sesión responde 401 en JSON
+    en lugar de redirigir a la página de login.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'exito': False, 'error': 'Debes iniciar sesión.'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def _leer_cantidad(request):
+    """Cantidad enviada por POST (1 por defecto), o None si no es válida."""
+    try:
+        return int(request.POST.get('cantidad', 1))
+    except (TypeError, ValueError):
+        return None
+
+
+def _linea_json(item):
+    return {
+        'bicicleta_id': item['bicicleta'].pk,
+        'cantidad': item['cantidad'],
+        'precio': str(item['precio']),
+        'precio_lista': str(item['precio_lista']),
+        'subtotal': str(item['subtotal']),
+    }
+
+
+def _respuesta_carrito(request, carrito, exito, mensaje, bicicleta_id):
+    """
+    Respuesta común de la API del carrito: la línea afectada (None si ya no
+    está en el carrito), el total y el número del badge. Con `fragmentos=1`
+    incluye además el HTML de la línea, el resumen y el badge, para
+    reemplazarlos en la página sin recargarla.
+    """
+    resumen = carrito.resumen()
+    item = next((item for item in resumen if item['bicicleta'].pk == bicicleta_id), None)
+    datos = {
+        'exito': exito,
+        'mensaje': mensaje,
+        'linea': _linea_json(item) if item else None,
+        'total': str(resumen.total),
+        'cantidad': carrito.cantidad,
+        'lineas': len(resumen),
+    }
+    if request.GET.get('fragmentos') or request.POST.get('fragmentos'):
+        datos['fragmentos'] = {
+            'linea': render_to_string(
+                'pedidos/_linea_carrito.html', {'item': item}, request=request
+            ) if item else '',
+            'resumen': render_to_string(
+                'pedidos/_resumen_carrito.html', {'carrito_total': resumen.total}, request=request
+            ),
+            'badge': render_to_string('pedidos/_badge_carrito.html', {'cantidad': carrito.cantidad}),
+        }
+    return JsonResponse(datos, status=200 if exito else 400)
+
+
+@api_login_required
+@require_POST
+def api_agregar_carrito(request, bicicleta_id):
+    """Agrega una bicicleta al carrito y responde en JSON."""
+    bicicleta = get_object_or_404(con_precio_efectivo(Bicicleta.objects.all()), id=bicicleta_id)
+    carrito = obtener_carrito(request)
+    cantidad = _leer_cantidad(request)
+    if cantidad is None or cantidad < 1:
+        return _respuesta_carrito(request, carrito, False, 'Cantidad inválida.', bicicleta_id)
+    exito, mensaje = carrito.agregar(bicicleta, cantidad)
+    return _respuesta_carrito(request, carrito, exito, mensaje, bicicleta_id)
+
+
+@api_login_required
+@require_POST
+def api_actualizar_carrito(request, bicicleta_id):
+    """Actualiza la cantidad de una bicicleta y responde en JSON."""
+    carrito = obtener_carrito(request)
+    cantidad = _leer_cantidad(request)
+    if cantidad is None:
+        return _respuesta_carrito(request, carrito, False, 'Cantidad inválida.', bicicleta_id)
+    exito, mensaje = carrito.actualizar_cantidad(bicicleta_id, cantidad)
+    return _respuesta_carrito(request, carrito, exito, mensaje, bicicleta_id)
+
+
+@api_login_required
+@require_POST
+def api_eliminar_carrito(request, bicicleta_id):
+    """Elimina una bicicleta del carrito y responde en JSON."""
+    carrito = obtener_carrito(request)
+    carrito.eliminar(bicicleta_id)
+    return _respuesta_carrito(request, carrito, True, 'Producto eliminado del carrito.', bicicleta_id)
+
+
+@api_login_required
+@require_POST
+def api_agregar_lote_carrito(request):
+    """
+    Agrega varias bicicletas al carrito en una sola petición. Acepta JSON
+    {"lineas": [{"bicicleta": id, "cantidad": n}, ...]} o un formulario con
+    los campos `bicicleta` y `cantidad` repetidos. Responde con el resultado
+    de cada línea y los totales del carrito.
+    """
+    lineas = _leer_lineas_lote(request)
+    if lineas is None:
+        return JsonResponse({'exito': False, 'mensaje': 'Líneas inválidas.'}, status=400)
+    if len(lineas) > MAXIMO_LINEAS_LOTE:
+        return JsonResponse(
+            {'exito': False, 'mensaje': f'Máximo {MAXIMO_LINEAS_LOTE} líneas por petición.'},
+            status=400,
+        )
+    
+    carrito = obtener_carrito(request)
+    resultados = carrito.agregar_varios(lineas)
+    resumen = carrito.resumen()
+    return JsonResponse({
+        'exito': all(exito for _bicicleta_id, exito, _mensaje in resultados),
+        'resultados': [
+            {'bicicleta_id': bicicleta_id, 'exito': exito, 'mensaje': mensaje}
+            for bicicleta_id, exito, mensaje in resultados
+        ],
+        'total': str(resumen.total),
+        'cantidad': carrito.cantidad,
+        'lineas': len(resumen),
+    })
+
+
+def _leer_lineas_lote(request):
+    """Lista de (bicicleta_id, cantidad) del cuerpo de la petición, o None si no es válida."""
+    try:
+        if request.content_type == 'application/json':
+            datos = json.loads(request.body)
+            pares = [(linea['bicicleta'], linea.get('cantidad', 1)) for linea in datos['lineas']]
+        else:
+            ids = request.POST.getlist('bicicleta')
+            cantidades = request.POST.getlist('cantidad')
+            if len(ids) != len(cantidades):
+                return None
+            pares = zip(ids, cantidades)
+        lineas = [(int(bicicleta_id), int(cantidad)) for bicicleta_id, cantidad in pares]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if not lineas or any(cantidad < 1 for _bicicleta_id, cantidad in lineas):
+        return None
+    return lineas
+
+
 @login_required
+@idempotente
 def checkout(request):
     """Vista de checkout para confirmar el pedido."""
-    carrito = Carrito(request)
+    carrito = obtener_carrito(request)
     
     # Verificar que hay items en el carrito
     if len(carrito) == 0:
@@ -415,43 +527,26 @@ def checkout(request):
         direccion = request.POST.get('direccion', '').strip()
         notas = request.POST.get('notas', '').strip()
         
+        resumen = carrito.resumen()
         if not direccion:
             messages.error(request, 'Por favor ingresa una dirección de envío.')
             return render(request, 'pedidos/checkout.html', {
-                'carrito_items': carrito.get_items(),
-                'carrito_total': carrito.get_total()
+                'carrito_items': resumen,
+                'carrito_total': resumen.total
             })
         
-        # Verificar stock antes de crear el pedido
-        items = carrito.get_items()
-        for item in items:
-            bicicleta = item['bicicleta']
-            if item['cantidad'] > bicicleta.stock:
-                messages.error(
-                    request,
-                    f'No hay suficiente stock de {bicicleta.marca} {bicicleta.modelo}. '
-                    f'Disponible: {bicicleta.stock}'
-                )
-                return redirect('pedidos:carrito')
-        
-        # Crear el pedido (sin descontar stock - se hace al despachar)
-        pedido = Pedido.objects.create(
-            cliente=request.user,
-            direccion_envio=direccion,
-            notas=notas,
-            estado=Pedido.Estado.PENDIENTE,
-            total=carrito.get_total()
-        )
-        
-        # Crear los detalles del pedido (sin descontar stock)
-        for item in items:
-            bicicleta = item['bicicleta']
-            DetallePedido.objects.create(
-                pedido=pedido,
-                bicicleta=bicicleta,
-                cantidad=item['cantidad'],
-                precio_unitario=item['precio']
+        # Crear el pedido en una sola transacción (sin descontar stock - se
+        # hace al despachar)
+        try:
+            pedido = servicios.crear_pedido(
+                request.user,
+                {item['bicicleta'].pk: item['cantidad'] for item in resumen},
+                direccion,
+                notas,
             )
+        except servicios.StockInsuficiente as error:
+            messages.error(request, str(error))
+            return redirect('pedidos:carrito')
         
         # Limpiar el carrito
         carrito.limpiar()
@@ -463,8 +558,9 @@ def checkout(request):
         )
         return redirect('pedidos:detalle', pk=pedido.pk)
     
+    resumen = carrito.resumen()
     return render(request, 'pedidos/checkout.html', {
-        'carrito_items': carrito.get_items(),
-        'carrito_total': carrito.get_total(),
+        'carrito_items': resumen,
+        'carrito_total': resumen.total,
         'direccion_predeterminada': request.user.direccion or ''
     })
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ProductosConfig(AppConfig):
     name = 'productos'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
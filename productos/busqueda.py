@@ -0,0 +1,107 @@
+"""
+Índice de búsqueda de texto completo para el catálogo.
+
+En SQLite se usa una tabla virtual FTS5 (productos_bicicleta_fts) con una
+fila por bicicleta (rowid = id de la bicicleta) sobre marca, modelo y
+descripción. El índice se mantiene sincronizado con las señales de
+Bicicleta y se puede reconstruir con `manage.py reconstruir_indice_busqueda`.
+En otros motores se usa icontains como respaldo.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+TABLA_FTS = 'productos_bicicleta_fts'
+
+# Pesos de bm25 por columna: marca, modelo, descripción
+PESOS_COLUMNAS = (10.0, 5.0, 1.0)
+
+SQL_CREAR = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+    "marca, modelo, descripcion, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+SQL_ELIMINAR = f"DROP TABLE IF EXISTS {TABLA_FTS}"
+
+
+def usa_fts():
+    """Indica si la base de datos soporta el índice FTS5."""
+    return connection.vendor == 'sqlite'
+
+
+def expresion_fts(texto):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura.
+    Cada palabra se busca como prefijo y todas deben coincidir.
+    """
+    palabras = re.findall(r'\w+', texto.lower())
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def indexar(bicicleta):
+    """Agrega o actualiza una bicicleta en el índice."""
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [bicicleta.pk])
+        cursor.execute(
+            f"INSERT INTO {TABLA_FTS} (rowid, marca, modelo, descripcion) VALUES (%s, %s, %s, %s)",
+            [bicicleta.pk, bicicleta.marca, bicicleta.modelo, bicicleta.descripcion],
+        )
+
+
+def desindexar(bicicleta_id):
+    """Elimina una bicicleta del índice."""
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [bicicleta_id])
+
+
+def reconstruir():
+    """Reconstruye el índice completo desde la tabla de bicicletas. Retorna el total indexado."""
+    if not usa_fts():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CREAR)
+        cursor.execute(f"DELETE FROM {TABLA_FTS}")
+        cursor.execute(
+            f"INSERT INTO {TABLA_FTS} (rowid, marca, modelo, descripcion) "
+            "SELECT id, marca, modelo, descripcion FROM productos_bicicleta"
+        )
+        cursor.execute(f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLA_FTS}")
+        return cursor.fetchone()[0]
+
+
+def buscar(queryset, texto):
+    """
+    Filtra `queryset` por el texto buscado y lo anota con `relevancia`
+    (bm25: valores menores son más relevantes).
+    """
+    expresion = expresion_fts(texto)
+    if not expresion:
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField()))
+    
+    if not usa_fts():
+        return queryset.filter(
+            Q(marca__icontains=texto) |
+            Q(modelo__icontains=texto) |
+            Q(descripcion__icontains=texto)
+        ).annotate(relevancia=Value(0.0, output_field=FloatField()))
+    
+    tabla = queryset.model._meta.db_table
+    pesos = ', '.join(str(peso) for peso in PESOS_COLUMNAS)
+    return queryset.filter(
+        pk__in=RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [expresion])
+    ).annotate(
+        relevancia=RawSQL(
+            f"SELECT bm25({TABLA_FTS}, {pesos}) FROM {TABLA_FTS} "
+            f"WHERE {TABLA_FTS} MATCH %s AND rowid = {tabla}.id",
+            [expresion],
+            output_field=FloatField(),
+        )
+    )
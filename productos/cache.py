@@ -0,0 +1,104 @@
+"""
+Caché de fragmentos renderizados del catálogo.
+
+Las claves incluyen una versión del catálogo que se incrementa cada vez que
+se guarda o elimina una Bicicleta o una Promoción, así que nunca hace falta
+borrar entradas: las versiones anteriores simplemente dejan de consultarse y
+expiran solas. La versión es una marca de tiempo en milisegundos, lo que
+evita reutilizar números si la caché se vacía, y sirve además como fecha de
+última modificación del catálogo.
+
+Funciona con cualquier backend de caché de Django (memoria local, archivos).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+
+CLAVE_VERSION = 'productos:catalogo:version'
+CLAVE_ACIERTOS = 'productos:fragmentos:aciertos'
+CLAVE_FALLOS = 'productos:fragmentos:fallos'
+
+# El token CSRF es distinto para cada usuario: los fragmentos se renderizan
+# con este marcador y se reemplaza por el token real al servirlos.
+MARCADOR_CSRF = '__CSRF_FRAGMENTO__'
+
+
+def _ahora_ms():
+    return int(time.time() * 1000)
+
+
+def version_catalogo():
+    """Versión actual del catálogo."""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = _ahora_ms()
+        if not cache.add(CLAVE_VERSION, version, timeout=None):
+            version = cache.get(CLAVE_VERSION, version)
+    return version
+
+
+def incrementar_version():
+    """Invalida todos los fragmentos del catálogo."""
+    actual = cache.get(CLAVE_VERSION) or 0
+    cache.set(CLAVE_VERSION, max(_ahora_ms(), actual + 1), timeout=None)
+
+
+def _contar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def clave_fragmento(nombre, partes):
+    """Clave de caché para un fragmento según sus parámetros normalizados."""
+    resumen = hashlib.md5(repr(partes).encode('utf-8'), usedforsecurity=False).hexdigest()
+    # Las promociones vigentes cambian con la fecha aunque nadie guarde nada
+    hoy = timezone.localdate().isoformat()
+    return f'productos:fragmento:{nombre}:{version_catalogo()}:{hoy}:{resumen}'
+
+
+def fragmento(nombre, partes, renderizar):
+    """
+    Retorna el fragmento cacheado para (nombre, partes) o lo genera con
+    `renderizar()` y lo guarda. `partes` debe contener todo lo que cambia el
+    resultado (filtros normalizados, si el usuario está autenticado, etc.).
+    """
+    clave = clave_fragmento(nombre, partes)
+    valor = cache.get(clave)
+    if valor is not None:
+        _contar(CLAVE_ACIERTOS)
+        return valor
+    _contar(CLAVE_FALLOS)
+    valor = renderizar()
+    cache.set(clave, valor, timeout=settings.CATALOGO_CACHE_TIMEOUT)
+    return valor
+
+
+def con_csrf(request, html):
+    """Reemplaza el marcador CSRF de un fragmento por el token de la petición."""
+    if MARCADOR_CSRF not in html:
+        return html
+    return html.replace(MARCADOR_CSRF, get_token(request))
+
+
+def estadisticas():
+    """Aciertos, fallos y tasa de aciertos de la caché de fragmentos."""
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': aciertos / total if total else 0,
+    }
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
@@ -0,0 +1,97 @@
+"""
+GET condicional (ETag / Last-Modified) para el catálogo y el detalle.
+
+El contenido de estas páginas depende de:
+- la versión del catálogo, que cambia con cada guardado de Bicicleta o
+  Promoción (y por tanto cubre `fecha_actualizacion` y los cambios de
+  promociones);
+- la fecha del día, porque las promociones vigentes cambian al pasar
+  fecha_inicio/fecha_fin sin que nadie guarde nada;
+- el usuario y su carrito, que aparecen en la barra de navegación.
+
+Con esos datos se calcula un ETag sin consultar ni renderizar nada, y el
+cliente recibe un 304 si su copia sigue vigente. Last-Modified solo se
+envía a visitantes anónimos con el carrito vacío (típicamente crawlers),
+porque la fecha por sí sola no distingue entre usuarios.
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from pedidos.carrito import obtener_carrito
+
+from . import cache as cache_catalogo
+from .models import Bicicleta
+
+
+def _estado(request, pk=None):
+    """Datos de validación de la petición, calculados una sola vez."""
+    clave = ('_estado_condicional', pk)
+    if getattr(request, '_estado_condicional_clave', None) == clave:
+        return request._estado_condicional
+
+    estado = None
+    # Los mensajes pendientes se muestran una sola vez: no responder 304
+    if not len(get_messages(request)):
+        hoy = timezone.localdate()
+        version = cache_catalogo.version_catalogo()
+        modificado = max(
+            datetime.datetime.fromtimestamp(version / 1000, tz=datetime.timezone.utc),
+            timezone.make_aware(datetime.datetime.combine(hoy, datetime.time.min)),
+        )
+        partes = [version, hoy.isoformat()]
+        if pk is not None:
+            actualizacion = (
+                Bicicleta.objects.filter(pk=pk, activo=True)
+                .values_list('fecha_actualizacion', flat=True)
+                .first()
+            )
+            if actualizacion is not None:
+                modificado = max(modificado, actualizacion)
+                partes.append(actualizacion.isoformat())
+            else:
+                partes = None
+        if partes is not None:
+            carrito = obtener_carrito(request).carrito
+            partes += [request.user.pk or 0, sorted(carrito.items())]
+            estado = {
+                'etag': hashlib.md5(repr(partes).encode('utf-8'), usedforsecurity=False).hexdigest(),
+                'modificado': modificado,
+                'anonimo': not request.user.is_authenticated and not carrito,
+            }
+
+    request._estado_condicional_clave = clave
+    request._estado_condicional = estado
+    return estado
+
+
+def _etag(request, pk=None, **kwargs):
+    estado = _estado(request, pk)
+    return estado['etag'] if estado else None
+
+
+def _ultima_modificacion(request, pk=None, **kwargs):
+    estado = _estado(request, pk)
+    if estado and estado['anonimo']:
+        return estado['modificado']
+    return None
+
+
+def respuesta_condicional(vista):
+    """Agrega ETag/Last-Modified a la vista y obliga a revalidar en cada visita."""
+    vista_condicional = condition(etag_func=_etag, last_modified_func=_ultima_modificacion)(vista)
+
+    @wraps(vista)
+    def wrapper(request, *args, **kwargs):
+        response = vista_condicional(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        else:
+            patch_cache_control(response, max_age=0, must_revalidate=True)
+        return response
+    return wrapper
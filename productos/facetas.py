@@ -0,0 +1,149 @@
+"""
+Facetas del catálogo: conteos por marca, gama, tipo y medida de marco.
+
+Los conteos viven materializados en ConteoFaceta (una fila por combinación),
+así que calcular los filtros del catálogo es una sola consulta sobre una
+tabla diminuta. Cada faceta cuenta las bicicletas que cumplen todos los
+filtros activos excepto el de su propia dimensión, de modo que el usuario
+ve cuántos resultados obtendría al cambiar esa opción.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Bicicleta, ConteoFaceta
+
+
+DIMENSIONES = ('marca', 'gama', 'tipo', 'medida_marco')
+
+CAMPOS_FACETA = frozenset(DIMENSIONES + ('activo',))
+
+
+def clave(bicicleta):
+    """Combinación de facetas de una bicicleta, o None si no se muestra en el catálogo."""
+    if not bicicleta.activo:
+        return None
+    return tuple(getattr(bicicleta, dimension) for dimension in DIMENSIONES)
+
+
+def clave_en_bd(bicicleta_id):
+    """Combinación de facetas guardada actualmente en la base de datos."""
+    fila = Bicicleta.objects.filter(pk=bicicleta_id).values_list('activo', *DIMENSIONES).first()
+    if fila is None or not fila[0]:
+        return None
+    return tuple(fila[1:])
+
+
+def ajustar(clave_faceta, delta):
+    """Suma `delta` al conteo de una combinación."""
+    if clave_faceta is None or delta == 0:
+        return
+    filtro = dict(zip(DIMENSIONES, clave_faceta))
+    actualizadas = ConteoFaceta.objects.filter(**filtro).update(cantidad=F('cantidad') + delta)
+    if actualizadas:
+        if delta < 0:
+            ConteoFaceta.objects.filter(cantidad__lte=0, **filtro).delete()
+        return
+    if delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ConteoFaceta.objects.create(cantidad=delta, **filtro)
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT
+        ConteoFaceta.objects.filter(**filtro).update(cantidad=F('cantidad') + delta)
+
+
+def mover(clave_anterior, clave_nueva):
+    """Registra que una bicicleta pasó de una combinación a otra."""
+    if clave_anterior == clave_nueva:
+        return
+    ajustar(clave_anterior, -1)
+    ajustar(clave_nueva, 1)
+
+
+@transaction.atomic
+def reconstruir():
+    """Recalcula todos los conteos desde la tabla de bicicletas. Retorna las combinaciones creadas."""
+    ConteoFaceta.objects.all().delete()
+    filas = (
+        Bicicleta.objects.filter(activo=True)
+        .values(*DIMENSIONES)
+        .annotate(cantidad=Count('pk'))
+        .order_by()
+    )
+    conteos = ConteoFaceta.objects.bulk_create(ConteoFaceta(**fila) for fila in filas)
+    return len(conteos)
+
+
+def _agrupar(filas, filtros):
+    """
+    Calcula las facetas a partir de filas (marca, gama, tipo, medida_marco, cantidad).
+    `filtros` usa las mismas claves que DIMENSIONES; los valores vacíos no filtran.
+    """
+    activos = {
+        dimension: valor.lower() if dimension == 'marca' else valor
+        for dimension, valor in filtros.items()
+        if valor
+    }
+    conteos = {dimension: {} for dimension in DIMENSIONES}
+    total = 0
+    
+    for *valores, cantidad in filas:
+        if cantidad <= 0:
+            continue
+        fila = dict(zip(DIMENSIONES, valores))
+        fallos = [
+            dimension for dimension, valor in activos.items()
+            if (fila[dimension].lower() if dimension == 'marca' else fila[dimension]) != valor
+        ]
+        if not fallos:
+            total += cantidad
+        for dimension in DIMENSIONES:
+            # Una faceta ignora el filtro de su propia dimensión
+            if not fallos or fallos == [dimension]:
+                conteos[dimension][fila[dimension]] = conteos[dimension].get(fila[dimension], 0) + cantidad
+    
+    return conteos, total
+
+
+class Facetas:
+    """Conteos por dimensión listos para el template."""
+    
+    def __init__(self, conteos, total):
+        self.total = total
+        self.marcas = sorted(conteos['marca'].items(), key=lambda par: par[0].lower())
+        self.gamas = self._con_etiquetas(Bicicleta.Gama.choices, conteos['gama'])
+        self.tipos = self._con_etiquetas(Bicicleta.Tipo.choices, conteos['tipo'])
+        self.medidas = self._con_etiquetas(Bicicleta.MedidaMarco.choices, conteos['medida_marco'])
+    
+    @staticmethod
+    def _con_etiquetas(choices, conteos):
+        return [(valor, etiqueta, conteos.get(valor, 0)) for valor, etiqueta in choices]
+    
+    def marca_canonica(self, marca):
+        """Retorna la marca tal como está guardada (la búsqueda no distingue mayúsculas)."""
+        for valor, _cantidad in self.marcas:
+            if valor.lower() == marca.lower():
+                return valor
+        return marca
+
+
+def calcular(filtros):
+    """Facetas para los filtros dados, leídas de la tabla materializada."""
+    filas = ConteoFaceta.objects.values_list(*DIMENSIONES, 'cantidad')
+    return Facetas(*_agrupar(filas, filtros))
+
+
+def calcular_para(queryset, filtros):
+    """
+    Facetas sobre un queryset arbitrario (por ejemplo, resultados de una
+    búsqueda de texto, que la tabla materializada no puede representar).
+    `queryset` no debe tener aplicados los filtros de dimensión.
+    """
+    filas = (
+        queryset.order_by()
+        .values(*DIMENSIONES)
+        .annotate(cantidad=Count('pk'))
+        .values_list(*DIMENSIONES, 'cantidad')
+    )
+    return Facetas(*_agrupar(filas, filtros))
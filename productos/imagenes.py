@@ -0,0 +1,117 @@
+"""
+Variantes redimensionadas de Bicicleta.imagen.
+
+Al subir una imagen se generan copias en WebP y JPEG a anchos fijos, que los
+templates ofrecen con `srcset` para que el navegador descargue solo el
+tamaño que necesita. Las rutas generadas se guardan en
+Bicicleta.imagen_variantes:
+
+    {"original": "bicicletas/foto.jpg",
+     "anchos": {"320": {"webp": "...-320.webp", "jpeg": "...-320.jpg"}, ...}}
+"""
+import hashlib
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+ANCHOS = (320, 640, 1024)
+
+FORMATOS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+CARPETA_VARIANTES = 'bicicletas/variantes'
+
+
+def variantes_vigentes(bicicleta):
+    """Indica si las variantes guardadas corresponden a la imagen actual."""
+    nombre = bicicleta.imagen.name if bicicleta.imagen else ''
+    return (bicicleta.imagen_variantes or {}).get('original', '') == nombre
+
+
+def _prefijo(bicicleta_pk):
+    return f"{CARPETA_VARIANTES}/{bicicleta_pk}-"
+
+
+def _nombre_variante(bicicleta_pk, original, ancho, extension):
+    # El pk y un hash de la ruta completa evitan que dos bicicletas con
+    # archivos del mismo nombre (foto.png y foto.jpg) compartan variantes
+    huella = hashlib.sha1(original.encode('utf-8')).hexdigest()[:10]
+    return f"{_prefijo(bicicleta_pk)}{PurePosixPath(original).stem}-{huella}-{ancho}{extension}"
+
+
+def eliminar_variantes(bicicleta_pk, variantes, storage):
+    """Borra las variantes registradas por la bicicleta; nunca archivos de otra."""
+    prefijo = _prefijo(bicicleta_pk)
+    for formatos in (variantes or {}).get('anchos', {}).values():
+        for nombre in formatos.values():
+            if nombre.startswith(prefijo):
+                storage.delete(nombre)
+
+
+def generar_variantes(bicicleta):
+    """
+    Genera las variantes de la imagen de la bicicleta y retorna el
+    diccionario para imagen_variantes. No guarda la bicicleta.
+    """
+    storage = bicicleta.imagen.storage
+    eliminar_variantes(bicicleta.pk, bicicleta.imagen_variantes, storage)
+
+    if not bicicleta.imagen:
+        return {}
+
+    original = bicicleta.imagen.name
+    with bicicleta.imagen.open('rb') as archivo:
+        imagen = ImageOps.exif_transpose(Image.open(archivo))
+        imagen = imagen.convert('RGB')
+
+    anchos = {}
+    # Nunca ampliar: si la imagen es pequeña, solo se genera su ancho real
+    objetivos = sorted({min(ancho, imagen.width) for ancho in ANCHOS})
+    for ancho in objetivos:
+        alto = round(imagen.height * ancho / imagen.width)
+        redimensionada = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+        anchos[str(ancho)] = {}
+        for clave, (formato, extension, opciones) in FORMATOS.items():
+            buffer = BytesIO()
+            redimensionada.save(buffer, formato, **opciones)
+            nombre = _nombre_variante(bicicleta.pk, original, ancho, extension)
+            # Si el nombre existe, el storage elige otro: nunca se sobrescribe
+            anchos[str(ancho)][clave] = storage.save(nombre, ContentFile(buffer.getvalue()))
+
+    return {'original': original, 'anchos': anchos}
+
+
+def actualizar_variantes(bicicleta):
+    """Regenera las variantes y las guarda sin disparar las señales de Bicicleta."""
+    from .models import Bicicleta
+
+    bicicleta.imagen_variantes = generar_variantes(bicicleta)
+    Bicicleta.objects.filter(pk=bicicleta.pk).update(imagen_variantes=bicicleta.imagen_variantes)
+    return bicicleta.imagen_variantes
+
+
+def srcset(bicicleta, formato):
+    """Valor del atributo srcset para un formato, o '' si no hay variantes."""
+    if not variantes_vigentes(bicicleta):
+        return ''
+    storage = bicicleta.imagen.storage
+    anchos = bicicleta.imagen_variantes.get('anchos', {})
+    return ', '.join(
+        f"{storage.url(formatos[formato])} {ancho}w"
+        for ancho, formatos in sorted(anchos.items(), key=lambda par: int(par[0]))
+        if formato in formatos
+    )
+
+
+def url_mayor(bicicleta, formato='jpeg'):
+    """URL de la variante más grande, para navegadores sin soporte de srcset."""
+    anchos = (bicicleta.imagen_variantes or {}).get('anchos', {})
+    if not anchos or not variantes_vigentes(bicicleta):
+        return bicicleta.imagen.url
+    mayor = anchos[max(anchos, key=int)]
+    return bicicleta.imagen.storage.url(mayor[formato])
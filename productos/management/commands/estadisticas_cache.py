@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from productos import cache as cache_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Muestra aciertos y fallos de la caché de fragmentos del catálogo.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Pone los contadores en cero después de mostrarlos.',
+        )
+    
+    def handle(self, *args, **options):
+        datos = cache_catalogo.estadisticas()
+        self.stdout.write(f"Versión del catálogo: {cache_catalogo.version_catalogo()}")
+        self.stdout.write(f"Aciertos: {datos['aciertos']}")
+        self.stdout.write(f"Fallos: {datos['fallos']}")
+        self.stdout.write(f"Tasa de aciertos: {datos['tasa_aciertos']:.1%}")
+        if options['reiniciar']:
+            cache_catalogo.reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados.'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from productos import cache as cache_catalogo, imagenes
+from productos.models import Bicicleta
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes WebP/JPEG de las imágenes de bicicletas que no las tengan.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenera también las variantes que ya están al día.',
+        )
+    
+    def handle(self, *args, **options):
+        bicicletas = Bicicleta.objects.exclude(imagen='').exclude(imagen__isnull=True)
+        generadas = errores = 0
+        
+        for bicicleta in bicicletas.only('pk', 'modelo', 'imagen', 'imagen_variantes').iterator(chunk_size=200):
+            if not options['forzar'] and imagenes.variantes_vigentes(bicicleta):
+                continue
+            try:
+                imagenes.actualizar_variantes(bicicleta)
+            except (OSError, ValueError) as error:
+                errores += 1
+                self.stderr.write(f'Bicicleta #{bicicleta.pk} ({bicicleta.modelo}): {error}')
+                continue
+            generadas += 1
+            if generadas % 50 == 0:
+                self.stdout.write(f'{generadas} imágenes procesadas...')
+        
+        if generadas:
+            cache_catalogo.incrementar_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Variantes generadas para {generadas} bicicletas ({errores} errores).'
+        ))
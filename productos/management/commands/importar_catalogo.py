@@ -0,0 +1,247 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from productos import busqueda, cache as cache_catalogo, facetas
+from productos.models import Bicicleta
+
+
+CLAVE_NATURAL = ('marca', 'modelo', 'medida_marco')
+
+CAMPOS_OBLIGATORIOS_NUEVAS = ('gama', 'tipo', 'precio', 'costo')
+
+CAMPOS_ACTUALIZABLES = ('gama', 'tipo', 'precio', 'costo', 'stock', 'descripcion', 'activo')
+
+VALORES_VERDADEROS = {'1', 'true', 'si', 'sí', 'yes', 'x'}
+
+# Límites de las columnas de Bicicleta: DecimalField(max_digits=12,
+# decimal_places=2) y PositiveIntegerField
+MAXIMO_DECIMAL = Decimal('10') ** 10
+MAXIMO_ENTERO = 2147483647
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+def _opcion(valor, choices, campo):
+    """Acepta el valor o la etiqueta de la opción, sin distinguir mayúsculas."""
+    texto = str(valor).strip().lower()
+    for clave, etiqueta in choices:
+        if texto in (clave, etiqueta.lower()):
+            return clave
+    raise FilaInvalida(f"{campo} inválido: {valor!r}")
+
+
+def _decimal(valor, campo):
+    try:
+        numero = Decimal(str(valor).strip().replace(',', ''))
+    except InvalidOperation:
+        raise FilaInvalida(f"{campo} inválido: {valor!r}")
+    # NaN e infinito no se pueden comparar ni redondear
+    if not numero.is_finite():
+        raise FilaInvalida(f"{campo} inválido: {valor!r}")
+    if numero < 0:
+        raise FilaInvalida(f"{campo} no puede ser negativo")
+    if numero >= MAXIMO_DECIMAL:
+        raise FilaInvalida(f"{campo} fuera de rango: {valor!r}")
+    return numero.quantize(Decimal('0.01'))
+
+
+def _entero(valor, campo):
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise FilaInvalida(f"{campo} inválido: {valor!r}")
+    if numero < 0:
+        raise FilaInvalida(f"{campo} no puede ser negativo")
+    if numero > MAXIMO_ENTERO:
+        raise FilaInvalida(f"{campo} fuera de rango: {valor!r}")
+    return numero
+
+
+def normalizar_fila(fila):
+    """
+    Convierte una fila del archivo en {campo: valor} con tipos de Bicicleta.
+    Solo incluye los campos presentes y no vacíos (salvo descripción).
+    """
+    if not isinstance(fila, dict):
+        raise FilaInvalida(f"se esperaba un objeto, no {type(fila).__name__}")
+    fila = {str(clave).strip().lower(): valor for clave, valor in fila.items() if clave}
+    datos = {}
+    for campo in ('marca', 'modelo'):
+        valor = str(fila.get(campo) or '').strip()
+        if not valor:
+            raise FilaInvalida(f"falta {campo}")
+        datos[campo] = valor
+    if not fila.get('medida_marco'):
+        raise FilaInvalida("falta medida_marco")
+    datos['medida_marco'] = _opcion(fila['medida_marco'], Bicicleta.MedidaMarco.choices, 'medida_marco')
+
+    def presente(campo):
+        return fila.get(campo) not in (None, '')
+
+    if presente('gama'):
+        datos['gama'] = _opcion(fila['gama'], Bicicleta.Gama.choices, 'gama')
+    if presente('tipo'):
+        datos['tipo'] = _opcion(fila['tipo'], Bicicleta.Tipo.choices, 'tipo')
+    for campo in ('precio', 'costo'):
+        if presente(campo):
+            datos[campo] = _decimal(fila[campo], campo)
+    if presente('stock'):
+        datos['stock'] = _entero(fila['stock'], 'stock')
+    if 'descripcion' in fila and fila['descripcion'] is not None:
+        datos['descripcion'] = str(fila['descripcion']).strip()
+    if presente('activo'):
+        valor = fila['activo']
+        datos['activo'] = valor if isinstance(valor, bool) else str(valor).strip().lower() in VALORES_VERDADEROS
+    return datos
+
+
+def leer_archivo(ruta):
+    """Itera las filas de un archivo CSV, JSON (lista de objetos) o NDJSON."""
+    extension = ruta.suffix.lower()
+    if extension == '.csv':
+        with ruta.open(newline='', encoding='utf-8-sig') as archivo:
+            yield from csv.DictReader(archivo)
+    elif extension in ('.ndjson', '.jsonl'):
+        with ruta.open(encoding='utf-8') as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    yield json.loads(linea)
+    elif extension == '.json':
+        with ruta.open(encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        if isinstance(datos, dict):
+            datos = datos.get('bicicletas', [])
+        yield from datos
+    else:
+        raise CommandError(f"Formato no soportado: {ruta.name} (usa .csv, .json o .ndjson)")
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa o actualiza bicicletas desde archivos CSV/JSON. '
+        'Las filas se identifican por marca + modelo + medida_marco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+', help='Archivos .csv, .json o .ndjson')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra los cambios sin guardarlos.',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Filas por lote (por defecto 1000).',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        tamano_lote = max(1, options['lote'])
+        self.totales = {'creadas': 0, 'actualizadas': 0, 'sin_cambios': 0, 'errores': 0}
+
+        lote = {}
+        procesadas = 0
+        for nombre in options['archivos']:
+            ruta = Path(nombre)
+            if not ruta.exists():
+                raise CommandError(f"No existe el archivo {nombre}")
+            for numero, fila in enumerate(leer_archivo(ruta), start=2 if ruta.suffix.lower() == '.csv' else 1):
+                try:
+                    datos = normalizar_fila(fila)
+                except FilaInvalida as error:
+                    self.totales['errores'] += 1
+                    self.stderr.write(f"{ruta.name}:{numero}: {error}")
+                    continue
+                clave = tuple(datos[campo] for campo in CLAVE_NATURAL)
+                # Si la misma bicicleta aparece varias veces, gana la última fila
+                lote.setdefault(clave, {}).update(datos)
+                procesadas += 1
+                if len(lote) >= tamano_lote:
+                    self.procesar_lote(lote)
+                    lote = {}
+                    self.stdout.write(f"{procesadas} filas procesadas...")
+        if lote:
+            self.procesar_lote(lote)
+
+        if not self.dry_run and (self.totales['creadas'] or self.totales['actualizadas']):
+            # bulk_create/bulk_update no disparan señales: reconstruir las estructuras derivadas
+            facetas.reconstruir()
+            busqueda.reconstruir()
+            cache_catalogo.incrementar_version()
+
+        prefijo = '[dry-run] ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{self.totales['creadas']} creadas, "
+            f"{self.totales['actualizadas']} actualizadas, "
+            f"{self.totales['sin_cambios']} sin cambios, "
+            f"{self.totales['errores']} con errores."
+        ))
+
+    def procesar_lote(self, lote):
+        filtro = Q(
+            marca__in={clave[0] for clave in lote},
+            modelo__in={clave[1] for clave in lote},
+            medida_marco__in={clave[2] for clave in lote},
+        )
+        existentes = {
+            tuple(getattr(bicicleta, campo) for campo in CLAVE_NATURAL): bicicleta
+            for bicicleta in Bicicleta.objects.filter(filtro)
+        }
+
+        nuevas = []
+        modificadas = []
+        campos_modificados = set()
+        ahora = timezone.now()
+
+        for clave, datos in lote.items():
+            bicicleta = existentes.get(clave)
+            etiqueta = ' '.join(clave)
+            if bicicleta is None:
+                faltantes = [campo for campo in CAMPOS_OBLIGATORIOS_NUEVAS if campo not in datos]
+                if faltantes:
+                    self.totales['errores'] += 1
+                    self.stderr.write(f"{etiqueta}: bicicleta nueva sin {', '.join(faltantes)}")
+                    continue
+                nuevas.append(Bicicleta(**datos))
+                if self.dry_run:
+                    detalle = ', '.join(f"{campo}={datos[campo]}" for campo in CAMPOS_ACTUALIZABLES if campo in datos)
+                    self.stdout.write(f"+ {etiqueta}: {detalle}")
+                continue
+
+            cambios = []
+            for campo in CAMPOS_ACTUALIZABLES:
+                if campo in datos and getattr(bicicleta, campo) != datos[campo]:
+                    cambios.append((campo, getattr(bicicleta, campo), datos[campo]))
+                    setattr(bicicleta, campo, datos[campo])
+            if not cambios:
+                self.totales['sin_cambios'] += 1
+                continue
+            bicicleta.fecha_actualizacion = ahora
+            modificadas.append(bicicleta)
+            campos_modificados.update(campo for campo, _antes, _despues in cambios)
+            if self.dry_run:
+                detalle = ', '.join(f"{campo}: {antes} -> {despues}" for campo, antes, despues in cambios)
+                self.stdout.write(f"~ {etiqueta}: {detalle}")
+
+        if not self.dry_run:
+            with transaction.atomic():
+                Bicicleta.objects.bulk_create(nuevas, batch_size=500)
+                if modificadas:
+                    Bicicleta.objects.bulk_update(
+                        modificadas,
+                        sorted(campos_modificados) + ['fecha_actualizacion'],
+                        batch_size=500,
+                    )
+        self.totales['creadas'] += len(nuevas)
+        self.totales['actualizadas'] += len(modificadas)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from productos import facetas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los conteos materializados de facetas del catálogo.'
+    
+    def handle(self, *args, **options):
+        total = facetas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Facetas reconstruidas: {total} combinaciones.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from productos import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo del catálogo.'
+    
+    def handle(self, *args, **options):
+        if not busqueda.usa_fts():
+            self.stdout.write(self.style.WARNING(
+                'La base de datos no soporta FTS5; la búsqueda usa icontains.'
+            ))
+            return
+        total = busqueda.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido: {total} bicicletas indexadas.'))
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from productos import busqueda
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(busqueda.SQL_CREAR)
+    schema_editor.execute(
+        f"INSERT INTO {busqueda.TABLA_FTS} (rowid, marca, modelo, descripcion) "
+        "SELECT id, marca, modelo, descripcion FROM productos_bicicleta"
+    )
+
+
+def eliminar_indice(apps, schema_editor):
+    from productos import busqueda
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(busqueda.SQL_ELIMINAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
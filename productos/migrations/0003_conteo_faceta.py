@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_conteos(apps, schema_editor):
+    Bicicleta = apps.get_model('productos', 'Bicicleta')
+    ConteoFaceta = apps.get_model('productos', 'ConteoFaceta')
+    filas = (
+        Bicicleta.objects.filter(activo=True)
+        .values('marca', 'gama', 'tipo', 'medida_marco')
+        .annotate(cantidad=Count('pk'))
+        .order_by()
+    )
+    ConteoFaceta.objects.bulk_create(ConteoFaceta(**fila) for fila in filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0002_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoFaceta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.CharField(max_length=100, verbose_name='Marca')),
+                ('gama', models.CharField(choices=[('media', 'Media Gama'), ('alta', 'Alta Gama')], max_length=10, verbose_name='Gama')),
+                ('tipo', models.CharField(choices=[('ruta', 'Ruta'), ('mtb', 'MTB (Mountain Bike)')], max_length=10, verbose_name='Tipo')),
+                ('medida_marco', models.CharField(choices=[('xs', 'XS (Extra Small)'), ('s', 'S (Small)'), ('m', 'M (Medium)'), ('l', 'L (Large)'), ('xl', 'XL (Extra Large)')], max_length=5, verbose_name='Medida del Marco')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+            ],
+            options={
+                'verbose_name': 'Conteo de Faceta',
+                'verbose_name_plural': 'Conteos de Facetas',
+                'constraints': [models.UniqueConstraint(fields=('marca', 'gama', 'tipo', 'medida_marco'), name='conteo_faceta_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_conteos, migrations.RunPython.noop),
+    ]
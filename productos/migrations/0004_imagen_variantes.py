@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0003_conteo_faceta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bicicleta',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas (WebP/JPEG) generadas al subir la imagen', verbose_name='Variantes de la Imagen'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bicicleta',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['-stock', '-fecha_creacion', '-id'], name='bicicleta_catalogo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bicicleta',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['gama', 'tipo', '-stock', '-fecha_creacion'], name='bicicleta_gama_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bicicleta',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['marca', '-stock', '-fecha_creacion'], name='bicicleta_marca_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bicicleta',
+            index=models.Index(fields=['fecha_actualizacion', 'id'], name='bicicleta_actualizacion_idx'),
+        ),
+    ]
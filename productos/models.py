@@ -66,6 +66,13 @@ class Bicicleta(models.Model):
         null=True,
         verbose_name='Imagen'
     )
+    imagen_variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Variantes de la Imagen',
+        help_text='Versiones redimensionadas (WebP/JPEG) generadas al subir la imagen'
+    )
     descripcion = models.TextField(
         blank=True,
         verbose_name='Descripción'
@@ -89,6 +96,29 @@ class Bicicleta(models.Model):
         verbose_name = 'Bicicleta'
         verbose_name_plural = 'Bicicletas'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Orden del catálogo y filtros de stock sobre bicicletas activas
+            models.Index(
+                fields=['-stock', '-fecha_creacion', '-id'],
+                condition=models.Q(activo=True),
+                name='bicicleta_catalogo_idx',
+            ),
+            models.Index(
+                fields=['gama', 'tipo', '-stock', '-fecha_creacion'],
+                condition=models.Q(activo=True),
+                name='bicicleta_gama_tipo_idx',
+            ),
+            models.Index(
+                fields=['marca', '-stock', '-fecha_creacion'],
+                condition=models.Q(activo=True),
+                name='bicicleta_marca_idx',
+            ),
+            # Sincronización incremental del feed (?since=)
+            models.Index(
+                fields=['fecha_actualizacion', 'id'],
+                name='bicicleta_actualizacion_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.marca} {self.modelo} - {self.get_gama_display()}"
@@ -109,3 +139,49 @@ class Bicicleta(models.Model):
     def disponible(self):
         """Indica si hay stock disponible."""
         return self.stock > 0 and self.activo
+
+
+class ConteoFaceta(models.Model):
+    """
+    Conteo materializado de bicicletas activas por combinación de
+    marca, gama, tipo y medida de marco.
+    Se actualiza incrementalmente con las señales de Bicicleta y permite
+    calcular los filtros del catálogo sin recorrer la tabla de bicicletas.
+    """
+    
+    marca = models.CharField(
+        max_length=100,
+        verbose_name='Marca'
+    )
+    gama = models.CharField(
+        max_length=10,
+        choices=Bicicleta.Gama.choices,
+        verbose_name='Gama'
+    )
+    tipo = models.CharField(
+        max_length=10,
+        choices=Bicicleta.Tipo.choices,
+        verbose_name='Tipo'
+    )
+    medida_marco = models.CharField(
+        max_length=5,
+        choices=Bicicleta.MedidaMarco.choices,
+        verbose_name='Medida del Marco'
+    )
+    cantidad = models.IntegerField(
+        default=0,
+        verbose_name='Cantidad'
+    )
+    
+    class Meta:
+        verbose_name = 'Conteo de Faceta'
+        verbose_name_plural = 'Conteos de Facetas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['marca', 'gama', 'tipo', 'medida_marco'],
+                name='conteo_faceta_unico',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.marca} / {self.gama} / {self.tipo} / {self.medida_marco}: {self.cantidad}"
@@ -0,0 +1,156 @@
+"""
+Paginación por cursor (keyset) para listados ordenados.
+
+En lugar de OFFSET, cada página se filtra a partir de los valores de orden
+de la última (o primera) fila de la página anterior, por lo que el costo
+de cada página es el mismo sin importar qué tan profundo navegue el usuario.
+Los cursores son tokens opacos: JSON firmado y codificado en base64.
+"""
+import datetime
+import json
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+SALT_CURSOR = 'paginacion.cursor'
+
+
+class Pagina:
+    """Resultado de una página: objetos y tokens para navegar."""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras_paginas(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def _campos_orden(orden):
+    """Convierte ('-stock', 'pk') en [('stock', True), ('pk', False)]."""
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+
+
+def _codificar(direccion, valores):
+    return signing.dumps(
+        {'d': direccion, 'v': valores},
+        salt=SALT_CURSOR,
+        serializer=_SerializadorCursor,
+        compress=True,
+    )
+
+
+def _decodificar(token, modelo, campos):
+    """Retorna (direccion, valores) o None si el token no es válido."""
+    try:
+        datos = signing.loads(token, salt=SALT_CURSOR, serializer=_SerializadorCursor)
+        direccion, valores = datos['d'], datos['v']
+        if direccion not in ('sig', 'ant') or len(valores) != len(campos):
+            return None
+        convertidos = [
+            _convertir(modelo, nombre, valor)
+            for (nombre, _desc), valor in zip(campos, valores)
+        ]
+        return direccion, convertidos
+    except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+        return None
+
+
+def _convertir(modelo, nombre, valor):
+    """Convierte el valor JSON al tipo del campo; las anotaciones se usan tal cual."""
+    if nombre == 'pk':
+        return modelo._meta.pk.to_python(valor)
+    try:
+        return modelo._meta.get_field(nombre).to_python(valor)
+    except FieldDoesNotExist:
+        return valor
+
+
+def _filtro_despues(campos, valores, invertir=False):
+    """
+    Construye el filtro "filas que van después de `valores`" para el orden dado.
+    Con invertir=True construye el de "filas que van antes".
+    """
+    condicion = Q()
+    for i, (nombre, desc) in enumerate(campos):
+        iguales = {campos[j][0]: valores[j] for j in range(i)}
+        operador = 'lt' if desc != invertir else 'gt'
+        termino = Q(**iguales) & Q(**{f'{nombre}__{operador}': valores[i]})
+        condicion |= termino
+    return condicion
+
+
+def _valores_fila(objeto, campos):
+    return [getattr(objeto, nombre) for nombre, _desc in campos]
+
+
+def paginar(queryset, orden, cursor=None, tamano=12):
+    """
+    Retorna una Pagina de `queryset` ordenado por `orden`.
+
+    `orden` debe terminar en un campo único (normalmente 'pk' o '-pk') para
+    que el cursor identifique una posición exacta.
+    """
+    campos = _campos_orden(orden)
+    decodificado = _decodificar(cursor, queryset.model, campos) if cursor else None
+
+    if decodificado is None:
+        filas = list(queryset.order_by(*orden)[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        siguiente = _codificar('sig', _valores_fila(filas[-1], campos)) if hay_mas else None
+        return Pagina(filas, siguiente=siguiente)
+
+    direccion, valores = decodificado
+
+    if direccion == 'sig':
+        filas = list(
+            queryset.filter(_filtro_despues(campos, valores))
+            .order_by(*orden)[:tamano + 1]
+        )
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        siguiente = _codificar('sig', _valores_fila(filas[-1], campos)) if hay_mas else None
+        anterior = _codificar('ant', _valores_fila(filas[0], campos)) if filas else None
+        return Pagina(filas, siguiente=siguiente, anterior=anterior)
+
+    orden_inverso = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+    filas = list(
+        queryset.filter(_filtro_despues(campos, valores, invertir=True))
+        .order_by(*orden_inverso)[:tamano + 1]
+    )
+    hay_previas = len(filas) > tamano
+    filas = list(reversed(filas[:tamano]))
+    siguiente = _codificar('sig', _valores_fila(filas[-1], campos)) if filas else None
+    anterior = _codificar('ant', _valores_fila(filas[0], campos)) if hay_previas else None
+    return Pagina(filas, siguiente=siguiente, anterior=anterior)
+
+
+class _EncoderCursor(DjangoJSONEncoder):
+    """Conserva los microsegundos de las fechas (DjangoJSONEncoder los trunca)."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class _SerializadorCursor:
+    """Serializador JSON compacto que soporta fechas y decimales."""
+
+    def dumps(self, obj):
+        return _EncoderCursor(separators=(',', ':')).encode(obj).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
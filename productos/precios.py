@@ -0,0 +1,55 @@
+"""
+Motor de precios: aplica las promociones vigentes en la misma consulta.
+
+`con_precio_efectivo(queryset)` anota cada bicicleta con el mayor descuento
+vigente (propio o de todo el catálogo) y el precio resultante. Los descuentos
+del día están materializados en administracion.DescuentoVigente, así que un
+listado completo se resuelve con un join por clave primaria en lugar de
+revisar los rangos de fechas de todas las promociones.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+
+from administracion import promociones
+from administracion.models import CalculoDescuentos
+
+
+CERO = Decimal('0')
+CENTAVO = Decimal('0.01')
+
+
+def con_precio_efectivo(queryset):
+    """
+    Anota un queryset de Bicicleta con:
+    - descuento_promocion: porcentaje del mejor descuento vigente (0 si no hay)
+    - precio_efectivo: precio con ese descuento aplicado
+    """
+    promociones.asegurar_actualizado()
+    porcentaje = DecimalField(max_digits=5, decimal_places=2)
+    descuento_general = CalculoDescuentos.objects.filter(
+        pk=promociones.PK_ESTADO
+    ).values('descuento_general')
+    return queryset.annotate(
+        descuento_promocion=Greatest(
+            Coalesce(F('descuento_vigente__descuento'), Value(CERO), output_field=porcentaje),
+            Coalesce(Subquery(descuento_general), Value(CERO), output_field=porcentaje),
+            output_field=porcentaje,
+        ),
+    ).annotate(
+        precio_efectivo=Round(
+            ExpressionWrapper(
+                F('precio') * (Value(Decimal('100')) - F('descuento_promocion')) / Value(Decimal('100')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            2,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def precio_efectivo(bicicleta):
+    """Precio efectivo de una bicicleta ya anotada, o su precio de lista."""
+    precio = getattr(bicicleta, 'precio_efectivo', bicicleta.precio)
+    return Decimal(precio).quantize(CENTAVO)
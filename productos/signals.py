@@ -0,0 +1,64 @@
+"""
+Señales de productos para mantener sincronizadas las estructuras derivadas
+del catálogo (índice de búsqueda, conteos de facetas, variantes de imagen
+y versión de la caché).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from . import busqueda, cache, facetas, imagenes
+from .models import Bicicleta
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Bicicleta)
+def bicicleta_por_guardar(sender, instance, update_fields=None, **kwargs):
+    # Guardar la combinación de facetas previa solo si el guardado puede cambiarla
+    if update_fields is not None and not facetas.CAMPOS_FACETA.intersection(update_fields):
+        instance._faceta_anterior = facetas.clave(instance)
+    elif instance.pk:
+        instance._faceta_anterior = facetas.clave_en_bd(instance.pk)
+    else:
+        instance._faceta_anterior = None
+
+
+@receiver(post_save, sender=Bicicleta)
+def bicicleta_guardada(sender, instance, update_fields=None, **kwargs):
+    busqueda.indexar(instance)
+    facetas.mover(getattr(instance, '_faceta_anterior', None), facetas.clave(instance))
+    _actualizar_variantes(instance, update_fields)
+    # Al confirmar: si se invalida antes, otra petición podría volver a cachear
+    # el catálogo sin el cambio
+    transaction.on_commit(cache.incrementar_version)
+
+
+def _actualizar_variantes(instance, update_fields):
+    # Los guardados parciales que no tocan la imagen (p. ej. solo el stock) no regeneran nada
+    if update_fields is not None and 'imagen' not in update_fields:
+        return
+    if imagenes.variantes_vigentes(instance):
+        return
+    try:
+        imagenes.actualizar_variantes(instance)
+    except (OSError, ValueError):
+        # Una imagen rota no debe impedir guardar la bicicleta; el comando
+        # generar_variantes_imagenes la reintenta
+        logger.exception('No se pudieron generar las variantes de la bicicleta #%s', instance.pk)
+
+
+@receiver(pre_delete, sender=Bicicleta)
+def bicicleta_por_eliminar(sender, instance, **kwargs):
+    instance._faceta_anterior = facetas.clave_en_bd(instance.pk)
+
+
+@receiver(post_delete, sender=Bicicleta)
+def bicicleta_eliminada(sender, instance, **kwargs):
+    busqueda.desindexar(instance.pk)
+    facetas.ajustar(getattr(instance, '_faceta_anterior', None), -1)
+    imagenes.eliminar_variantes(instance.pk, instance.imagen_variantes, instance.imagen.storage)
+    transaction.on_commit(cache.incrementar_version)
@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html
+
+from productos import imagenes
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_responsive(bicicleta, sizes='100vw', clase='', estilo=''):
+    """
+    Renderiza la imagen de la bicicleta como <picture> con srcset WebP y JPEG.
+    Si aún no hay variantes generadas, usa la imagen original.
+    """
+    srcset_webp = imagenes.srcset(bicicleta, 'webp')
+    srcset_jpeg = imagenes.srcset(bicicleta, 'jpeg')
+    if not srcset_jpeg:
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="lazy">',
+            bicicleta.imagen.url, clase, estilo, bicicleta.modelo,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        srcset_webp, sizes,
+        imagenes.url_mayor(bicicleta), srcset_jpeg, sizes, clase, estilo, bicicleta.modelo,
+    )
@@ -1,3 +1,287 @@
-from django.test import TestCase
+import json
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from administracion import promociones
+from bodega.models import IngresoStock
+from . import cache as cache_catalogo, imagenes
+from .models import Bicicleta
+from .paginacion import paginar
+from .views import ORDEN_CATALOGO
+
+
+def _bicicleta(modelo='Marlin', guardar=True, **campos):
+    """Bicicleta de prueba; `campos` reemplaza los valores por defecto."""
+    bicicleta = Bicicleta(**{
+        'marca': 'Trek', 'modelo': modelo, 'gama': 'media', 'tipo': 'mtb', 'medida_marco': 'm',
+        'precio': 1000, 'costo': 600, 'stock': 5, **campos,
+    })
+    if guardar:
+        bicicleta.save()
+    return bicicleta
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes de consulta se verifican con SQLite')
+class IndicesCatalogoTests(TestCase):
+    """Las consultas frecuentes del catálogo deben usar índices, no recorrer la tabla."""
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {indice}', plan)
+        self.assertIsNone(
+            re.search(r'SCAN productos_bicicleta\s*$', plan, re.MULTILINE),
+            f'Recorrido completo de la tabla:\n{plan}',
+        )
+
+    def test_orden_del_catalogo(self):
+        consulta = Bicicleta.objects.filter(activo=True).order_by(*ORDEN_CATALOGO)[:13]
+        self.assertUsaIndice(consulta, 'bicicleta_catalogo_idx')
+
+    def test_filtro_por_gama_y_tipo(self):
+        consulta = Bicicleta.objects.filter(
+            activo=True, gama=Bicicleta.Gama.ALTA, tipo=Bicicleta.Tipo.RUTA
+        ).order_by(*ORDEN_CATALOGO)[:13]
+        self.assertUsaIndice(consulta, 'bicicleta_gama_tipo_idx')
+
+    def test_filtro_por_gama(self):
+        consulta = Bicicleta.objects.filter(
+            activo=True, gama=Bicicleta.Gama.MEDIA
+        ).order_by(*ORDEN_CATALOGO)[:13]
+        self.assertUsaIndice(consulta, 'bicicleta_gama_tipo_idx')
+
+    def test_filtro_por_marca(self):
+        consulta = Bicicleta.objects.filter(activo=True, marca='Trek').order_by(*ORDEN_CATALOGO)[:13]
+        self.assertUsaIndice(consulta, 'bicicleta_marca_idx')
+
+    def test_bajo_stock(self):
+        consulta = Bicicleta.objects.filter(stock__lt=3, activo=True)
+        self.assertUsaIndice(consulta, 'bicicleta_catalogo_idx')
+
+
+def _imagen(nombre, color):
+    buffer = BytesIO()
+    formato = 'PNG' if nombre.endswith('.png') else 'JPEG'
+    Image.new('RGB', (400, 300), color).save(buffer, formato)
+    return SimpleUploadedFile(nombre, buffer.getvalue())
+
+
+class VariantesImagenTests(TestCase):
+    """Las variantes de cada bicicleta son solo suyas y un archivo roto no impide guardar."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def _nombres(self, bicicleta):
+        return {
+            nombre
+            for formatos in bicicleta.imagen_variantes['anchos'].values()
+            for nombre in formatos.values()
+        }
+
+    def test_archivos_con_el_mismo_nombre_no_se_mezclan(self):
+        a = _bicicleta('A', imagen=_imagen('foto.png', 'red'))
+        nombres_a = self._nombres(a)
+        b = _bicicleta('B', imagen=_imagen('foto.jpg', 'blue'))
+
+        a.refresh_from_db()
+        self.assertEqual(self._nombres(a), nombres_a)
+        self.assertFalse(nombres_a & self._nombres(b))
+        storage = a.imagen.storage
+        self.assertTrue(all(storage.exists(nombre) for nombre in nombres_a))
+
+        b.delete()
+        self.assertTrue(all(storage.exists(nombre) for nombre in nombres_a))
+
+    def test_no_borra_variantes_que_no_registro(self):
+        a = _bicicleta('A', imagen=_imagen('foto.png', 'red'))
+        ajenas = {'anchos': {'320': {'jpeg': next(iter(self._nombres(a)))}}}
+        imagenes.eliminar_variantes(a.pk + 1, ajenas, a.imagen.storage)
+        self.assertTrue(a.imagen.storage.exists(ajenas['anchos']['320']['jpeg']))
+
+    def test_imagen_faltante_no_impide_guardar(self):
+        bicicleta = _bicicleta('A', imagen=_imagen('foto.png', 'red'))
+        bicicleta.imagen.storage.delete(bicicleta.imagen.name)
+        bicicleta.imagen_variantes = {}
+
+        bicicleta.stock = 7
+        bicicleta.save(update_fields=['stock'])
+        with self.assertLogs('productos.signals', level='ERROR'):
+            bicicleta.save()
+
+        bicicleta.refresh_from_db()
+        self.assertEqual(bicicleta.stock, 7)
+
+
+class FeedCatalogoTests(TestCase):
+    """El feed incremental incluye las bicicletas cuyo precio efectivo pudo cambiar."""
+
+    def setUp(self):
+        for modelo in ('A', 'B'):
+            _bicicleta(modelo, stock=2)
+        promociones.materializar(forzar=True)
+
+    def _feed(self, desde):
+        response = self.client.get(reverse('productos:feed'), {'since': desde.isoformat()})
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        return [json.loads(linea)['modelo'] for linea in lineas]
+
+    def test_since_sin_cambios_no_incluye_nada(self):
+        self.assertEqual(self._feed(timezone.now()), [])
+
+    def test_since_incluye_las_modificadas(self):
+        corte = timezone.now()
+        bicicleta = Bicicleta.objects.get(modelo='B')
+        bicicleta.stock = 1
+        bicicleta.save()
+        self.assertEqual(self._feed(corte), ['B'])
+
+    def test_since_invalido_responde_400(self):
+        for since in ('ayer', '2024-02-30T00:00:00'):
+            response = self.client.get(reverse('productos:feed'), {'since': since})
+            self.assertEqual(response.status_code, 400, since)
+            self.assertIn('error', response.json())
+
+    def test_since_incluye_los_ingresos_de_stock(self):
+        corte = timezone.now()
+        IngresoStock.objects.create(bicicleta=Bicicleta.objects.get(modelo='A'), cantidad=3)
+        self.assertEqual(self._feed(corte), ['A'])
+
+    def test_since_incluye_todas_si_se_recalcularon_los_descuentos(self):
+        corte = timezone.now()
+        promociones.materializar(forzar=True)
+        self.assertEqual(sorted(self._feed(corte)), ['A', 'B'])
+
+
+class VersionCatalogoTests(TestCase):
+    """La caché del catálogo se invalida cuando el cambio ya es visible."""
+
+    def test_guardar_incrementa_la_version_al_confirmar(self):
+        antes = cache_catalogo.version_catalogo()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            _bicicleta('A', stock=2)
+            self.assertEqual(cache_catalogo.version_catalogo(), antes)
+        self.assertTrue(callbacks)
+        self.assertGreater(cache_catalogo.version_catalogo(), antes)
+
+
+class PaginacionCursorTests(TestCase):
+    """Recorrer el catálogo por cursor no salta ni repite filas, aunque el orden empate."""
+
+    def setUp(self):
+        # Varias bicicletas con el mismo stock y la misma fecha de creación
+        for i, stock in enumerate((2, 2, 2, 2, 1, 1, 0, 0, 0, 0, 0)):
+            _bicicleta(f'M{i}', stock=stock)
+        Bicicleta.objects.update(fecha_creacion=timezone.now())
+        self.esperado = list(Bicicleta.objects.order_by(*ORDEN_CATALOGO).values_list('pk', flat=True))
+
+    def _paginas_hacia_adelante(self, tamano):
+        paginas = [paginar(Bicicleta.objects.all(), ORDEN_CATALOGO, tamano=tamano)]
+        while paginas[-1].siguiente:
+            paginas.append(paginar(Bicicleta.objects.all(), ORDEN_CATALOGO, paginas[-1].siguiente, tamano))
+        return paginas
+
+    def test_hacia_adelante_recorre_todas_una_vez(self):
+        for tamano in (1, 3, 4, 11, 20):
+            paginas = self._paginas_hacia_adelante(tamano)
+            vistas = [bicicleta.pk for pagina in paginas for bicicleta in pagina]
+            self.assertEqual(vistas, self.esperado, f'tamano={tamano}')
+
+    def test_hacia_atras_vuelve_a_las_mismas_paginas(self):
+        paginas = self._paginas_hacia_adelante(3)
+        actual = paginas[-1]
+        for esperada in reversed(paginas[:-1]):
+            actual = paginar(Bicicleta.objects.all(), ORDEN_CATALOGO, actual.anterior, 3)
+            self.assertEqual([b.pk for b in actual], [b.pk for b in esperada])
+        self.assertIsNone(actual.anterior)
+
+    def test_cursor_adulterado_vuelve_a_la_primera_pagina(self):
+        pagina = paginar(Bicicleta.objects.all(), ORDEN_CATALOGO, 'no-es-un-cursor', 3)
+        self.assertEqual([b.pk for b in pagina], self.esperado[:3])
+
+
+class ImportarCatalogoTests(TestCase):
+    """El comando importar_catalogo crea, actualiza y reporta filas inválidas."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.directorio = Path(directorio)
+        _bicicleta(stock=2)
+
+    def _importar(self, contenido, *opciones, nombre='catalogo.csv'):
+        ruta = self.directorio / nombre
+        ruta.write_text(contenido, encoding='utf-8')
+        salida, errores = StringIO(), StringIO()
+        call_command('importar_catalogo', str(ruta), *opciones, stdout=salida, stderr=errores)
+        return salida.getvalue(), errores.getvalue()
+
+    CSV = (
+        'marca,modelo,medida_marco,gama,tipo,precio,costo,stock\n'
+        'Trek,Marlin,M,,,1200,,5\n'
+        'Giant,TCR,L,alta,ruta,"3,500",2000,1\n'
+        'Giant,Talon,XXL,media,mtb,900,500,1\n'
+        'Scott,Scale,m,alta,,2000,1500,1\n'
+        ',SinMarca,m,media,mtb,900,500,1\n'
+    )
+
+    def test_crea_actualiza_y_reporta_errores(self):
+        salida, errores = self._importar(self.CSV)
+
+        self.assertIn('1 creadas, 1 actualizadas, 0 sin cambios, 3 con errores', salida)
+        self.assertIn('catalogo.csv:4: medida_marco inválido', errores)
+        self.assertIn('catalogo.csv:6: falta marca', errores)
+        self.assertIn('Scott Scale m: bicicleta nueva sin tipo', errores)
+
+        marlin = Bicicleta.objects.get(modelo='Marlin')
+        self.assertEqual((marlin.precio, marlin.costo, marlin.stock, marlin.gama), (1200, 600, 5, 'media'))
+        tcr = Bicicleta.objects.get(modelo='TCR')
+        self.assertEqual((tcr.gama, tcr.tipo, tcr.medida_marco, tcr.precio), ('alta', 'ruta', 'l', 3500))
+
+        salida, _errores = self._importar(self.CSV)
+        self.assertIn('0 creadas, 0 actualizadas, 2 sin cambios', salida)
+
+    def test_dry_run_no_guarda(self):
+        salida, _errores = self._importar(self.CSV, '--dry-run')
+
+        self.assertIn('[dry-run] 1 creadas, 1 actualizadas', salida)
+        self.assertIn('~ Trek Marlin m: precio: 1000.00 -> 1200.00, stock: 2 -> 5', salida)
+        self.assertFalse(Bicicleta.objects.filter(modelo='TCR').exists())
+        self.assertEqual(Bicicleta.objects.get(modelo='Marlin').stock, 2)
+
+    def test_valores_no_finitos_y_filas_que_no_son_objetos_se_reportan(self):
+        nueva = {'marca': 'Giant', 'medida_marco': 'm', 'gama': 'alta', 'tipo': 'ruta', 'costo': 1}
+        filas = [
+            1,
+            'x',
+            {**nueva, 'modelo': 'NaN', 'precio': 'NaN'},
+            {**nueva, 'modelo': 'Inf', 'precio': 'inf'},
+            {**nueva, 'modelo': 'Enorme', 'precio': '1e999'},
+            {**nueva, 'modelo': 'Stock', 'precio': 10, 'stock': '99999999999'},
+            {**nueva, 'modelo': 'TCR', 'precio': 10},
+        ]
+        salida, errores = self._importar(json.dumps(filas), nombre='catalogo.json')
+
+        self.assertIn('1 creadas, 0 actualizadas, 0 sin cambios, 6 con errores', salida)
+        self.assertIn('catalogo.json:1: se esperaba un objeto, no int', errores)
+        self.assertIn('catalogo.json:2: se esperaba un objeto, no str', errores)
+        self.assertIn("catalogo.json:3: precio inválido: 'NaN'", errores)
+        self.assertIn("catalogo.json:4: precio inválido: 'inf'", errores)
+        self.assertIn("catalogo.json:5: precio fuera de rango: '1e999'", errores)
+        self.assertIn("catalogo.json:6: stock fuera de rango: '99999999999'", errores)
+        self.assertTrue(Bicicleta.objects.filter(modelo='TCR').exists())
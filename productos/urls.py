@@ -6,4 +6,5 @@ app_name = 'productos'
 urlpatterns = [
     path('', views.catalogo, name='catalogo'),
     path('<int:pk>/', views.detalle_bicicleta, name='detalle'),
+    path('feed.ndjson', views.feed_catalogo, name='feed'),
 ]
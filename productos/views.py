@@ -1,52 +1,218 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, QueryDict, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
-from django.db import models
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from administracion import promociones
 from .models import Bicicleta
+from . import busqueda as indice_busqueda, cache as cache_catalogo, facetas, precios
+from .condicional import respuesta_condicional
+from .paginacion import paginar
 
 
-def catalogo(request):
-    """Vista del catálogo de bicicletas."""
+BICICLETAS_POR_PAGINA = 12
+
+# Orden del catálogo: primero las que tienen stock, luego las más recientes.
+# El pk al final desempata para que el cursor identifique una fila exacta.
+ORDEN_CATALOGO = ('-stock', '-fecha_creacion', '-pk')
+
+# Con búsqueda de texto, primero los resultados más relevantes.
+ORDEN_BUSQUEDA = ('relevancia',) + ORDEN_CATALOGO
+
+# Filas que se leen de la base de datos por cada lote del feed
+TAMANO_LOTE_FEED = 500
+
+CAMPOS_FEED = (
+    'id', 'marca', 'modelo', 'gama', 'tipo', 'medida_marco',
+    'precio', 'stock', 'activo', 'imagen', 'fecha_actualizacion',
+)
+
+
+def _parametros_catalogo(request):
+    """
+    Normaliza los filtros del catálogo: descarta valores inválidos y unifica
+    mayúsculas y espacios, para que peticiones equivalentes compartan caché.
+    """
+    def opcion(nombre, choices):
+        valor = request.GET.get(nombre, '').strip()
+        return valor if valor in dict(choices) else ''
+
+    return {
+        'gama': opcion('gama', Bicicleta.Gama.choices),
+        'tipo': opcion('tipo', Bicicleta.Tipo.choices),
+        'marca': request.GET.get('marca', '').strip().lower(),
+        'medida': opcion('medida', Bicicleta.MedidaMarco.choices),
+        'q': ' '.join(request.GET.get('q', '').split()).lower(),
+        'cursor': request.GET.get('cursor', '').strip(),
+    }
+
+
+def _url_catalogo(parametros, **cambios):
+    """Query string del catálogo con los parámetros no vacíos."""
+    query = QueryDict(mutable=True)
+    for nombre, valor in {**parametros, **cambios}.items():
+        if valor:
+            query[nombre] = valor
+    return f"?{query.urlencode()}" if query else '?'
+
+
+def _renderizar_catalogo(request, parametros):
+    """Consulta y renderiza el contenido del catálogo para los parámetros dados."""
+    gama = parametros['gama']
+    tipo = parametros['tipo']
+    marca = parametros['marca']
+    medida = parametros['medida']
+    busqueda = parametros['q']
+
     # Mostrar TODAS las bicicletas activas (incluso las de stock 0, se muestran como "Agotado")
-    bicicletas = Bicicleta.objects.filter(activo=True).order_by('-stock', '-fecha_creacion')
-    
-    # Obtener marcas únicas para el filtro
-    marcas_disponibles = Bicicleta.objects.filter(activo=True).values_list('marca', flat=True).distinct()
-    
-    # Filtros
-    gama = request.GET.get('gama', '')
-    tipo = request.GET.get('tipo', '')
-    marca = request.GET.get('marca', '')
-    busqueda = request.GET.get('q', '')
-    
+    bicicletas = precios.con_precio_efectivo(Bicicleta.objects.filter(activo=True))
+
     # Verificar si hay filtros activos
-    hay_filtros = bool(gama or tipo or marca or busqueda)
-    
+    hay_filtros = bool(gama or tipo or marca or medida or busqueda)
+
+    filtros = {'marca': marca, 'gama': gama, 'tipo': tipo, 'medida_marco': medida}
+    if busqueda:
+        # La tabla materializada no conoce el texto buscado: contar sobre los resultados
+        bicicletas = indice_busqueda.buscar(bicicletas, busqueda)
+        conteos = facetas.calcular_para(bicicletas, filtros)
+    else:
+        conteos = facetas.calcular(filtros)
+
     if gama:
         bicicletas = bicicletas.filter(gama=gama)
     if tipo:
         bicicletas = bicicletas.filter(tipo=tipo)
     if marca:
-        bicicletas = bicicletas.filter(marca__iexact=marca)
-    if busqueda:
-        bicicletas = bicicletas.filter(
-            models.Q(marca__icontains=busqueda) | 
-            models.Q(modelo__icontains=busqueda)
-        )
-    
+        bicicletas = bicicletas.filter(marca=conteos.marca_canonica(marca))
+    if medida:
+        bicicletas = bicicletas.filter(medida_marco=medida)
+
+    pagina = paginar(
+        bicicletas,
+        ORDEN_BUSQUEDA if busqueda else ORDEN_CATALOGO,
+        cursor=parametros['cursor'],
+        tamano=BICICLETAS_POR_PAGINA,
+    )
+
+    # Los enlaces de navegación conservan los filtros activos
+    def url_pagina(token):
+        return _url_catalogo(parametros, cursor=token) if token else None
+
     context = {
-        'bicicletas': bicicletas,
-        'gamas': Bicicleta.Gama.choices,
-        'tipos': Bicicleta.Tipo.choices,
-        'marcas': marcas_disponibles,
+        'bicicletas': pagina,
+        'pagina_siguiente': url_pagina(pagina.siguiente),
+        'pagina_anterior': url_pagina(pagina.anterior),
+        'url_actual': request.path + _url_catalogo(parametros),
+        'facetas': conteos,
         'hay_filtros': hay_filtros,
         'filtro_gama': gama,
         'filtro_tipo': tipo,
-        'filtro_marca': marca,
+        'filtro_marca': conteos.marca_canonica(marca) if marca else '',
+        'filtro_medida': medida,
         'filtro_busqueda': busqueda,
+        'csrf_token': cache_catalogo.MARCADOR_CSRF,
     }
-    return render(request, 'productos/catalogo.html', context)
+    return render_to_string('productos/_catalogo.html', context, request=request)
+
+
+@respuesta_condicional
+def catalogo(request):
+    """Vista del catálogo de bicicletas, paginada por cursor y cacheada por filtros."""
+    parametros = _parametros_catalogo(request)
+    autenticado = request.user.is_authenticated
+
+    contenido = cache_catalogo.fragmento(
+        'catalogo',
+        (sorted(parametros.items()), autenticado),
+        lambda: _renderizar_catalogo(request, parametros),
+    )
+    return render(request, 'productos/catalogo.html', {
+        'contenido': cache_catalogo.con_csrf(request, contenido),
+    })
 
 
+def _renderizar_detalle(request, pk):
+    bicicleta = get_object_or_404(
+        precios.con_precio_efectivo(Bicicleta.objects.all()), pk=pk, activo=True
+    )
+    html = render_to_string('productos/_detalle.html', {
+        'bicicleta': bicicleta,
+        'csrf_token': cache_catalogo.MARCADOR_CSRF,
+    }, request=request)
+    return {'titulo': f"{bicicleta.marca} {bicicleta.modelo}", 'html': html}
+
+
+@respuesta_condicional
 def detalle_bicicleta(request, pk):
     """Vista de detalle de una bicicleta."""
-    bicicleta = get_object_or_404(Bicicleta, pk=pk, activo=True)
-    return render(request, 'productos/detalle.html', {'bicicleta': bicicleta})
+    datos = cache_catalogo.fragmento(
+        'detalle',
+        (pk, request.user.is_authenticated),
+        lambda: _renderizar_detalle(request, pk),
+    )
+    return render(request, 'productos/detalle.html', {
+        'titulo': datos['titulo'],
+        'contenido': cache_catalogo.con_csrf(request, datos['html']),
+    })
+
+
+@require_GET
+def feed_catalogo(request):
+    """
+    Feed del catálogo en NDJSON (una bicicleta por línea) para aliados y
+    marketplaces. Se transmite mientras se lee la base de datos, así que la
+    memoria usada no depende del tamaño del catálogo.
+
+    Sin parámetros incluye solo las bicicletas activas. Con
+    `?since=<fecha ISO>` incluye todas las modificadas desde esa fecha,
+    también las desactivadas, para que el aliado pueda retirarlas. Si desde
+    esa fecha se recalcularon los descuentos (cambio de día o de
+    promociones), el precio efectivo pudo cambiar sin tocar la bicicleta, así
+    que se incluyen además todas las activas.
+    """
+    bicicletas = Bicicleta.objects.all()
+    since = request.GET.get('since')
+    if since:
+        try:
+            desde = parse_datetime(since)
+        except ValueError:
+            # Bien formada pero imposible (p. ej. 2024-02-30)
+            desde = None
+        if desde is None:
+            return JsonResponse({'error': 'Parámetro since inválido; usa formato ISO 8601.'}, status=400)
+        if timezone.is_naive(desde):
+            desde = timezone.make_aware(desde)
+        modificadas = Q(fecha_actualizacion__gt=desde)
+        if promociones.recalculado_desde(desde):
+            modificadas |= Q(activo=True)
+        bicicletas = bicicletas.filter(modificadas)
+    else:
+        bicicletas = bicicletas.filter(activo=True)
+
+    filas = (
+        precios.con_precio_efectivo(bicicletas)
+        .order_by('fecha_actualizacion', 'pk')
+        .values(*CAMPOS_FEED, 'precio_efectivo')
+        .iterator(chunk_size=TAMANO_LOTE_FEED)
+    )
+    raiz = request.build_absolute_uri('/').rstrip('/')
+    url_media = request.build_absolute_uri(settings.MEDIA_URL)
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def lineas():
+        for fila in filas:
+            fila['precio_efectivo'] = fila['precio_efectivo'].quantize(precios.CENTAVO)
+            fila['disponible'] = fila['activo'] and fila['stock'] > 0
+            fila['url'] = raiz + reverse('productos:detalle', args=[fila['id']])
+            fila['imagen'] = f"{url_media}{fila['imagen']}" if fila['imagen'] else None
+            yield encoder.encode(fila) + '\n'
+
+    response = StreamingHttpResponse(lineas(), content_type='application/x-ndjson; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    return response